@@ -0,0 +1,56 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    teardown_databases,
+)
+
+# Свой кэш в памяти процесса: сигналы моделей поднимают версии страниц,
+# а замеры чистят кэш, и в общем кэше это задело бы рабочий сайт
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+    }
+}
+
+
+@contextmanager
+def benchmark_database():
+    """Временная тестовая БД и кэш, чтобы замеры не трогали рабочие."""
+    with override_settings(CACHES=BENCHMARK_CACHES):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+
+@contextmanager
+def stopwatch(samples):
+    """Добавляет в samples время выполнения блока в миллисекундах."""
+    started = time.perf_counter()
+    yield
+    samples.append((time.perf_counter() - started) * 1000)
+
+
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Сводка по замерам в миллисекундах."""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": statistics.mean(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
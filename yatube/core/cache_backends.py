@@ -0,0 +1,251 @@
+"""Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+LocMemCache живет внутри процесса: у каждого воркера gunicorn свой кэш,
+и cache.clear() в одном воркере не трогает остальные. SQLiteCache
+хранит записи в одном файле, поэтому все воркеры видят одни и те же
+данные. Это обычный бэкенд Django, и при переезде на несколько машин
+его заменяет Memcached или Redis без правок в коде.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "core.cache_backends.SQLiteCache",
+            "LOCATION": "/var/tmp/yatube-cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 10000, "CULL_FREQUENCY": 4},
+        }
+    }
+
+Записи с истекшим TIMEOUT удаляются при чтении и при очистке, а когда
+записей становится больше MAX_ENTRIES, удаляется 1/CULL_FREQUENCY
+давно не читавшихся (LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache ("
+    " key TEXT PRIMARY KEY,"
+    " value BLOB NOT NULL,"
+    " expires REAL,"
+    " accessed REAL NOT NULL"
+    ")",
+    "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)",
+    "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)",
+)
+
+# Время последнего чтения обновляется не чаще раза в секунду:
+# для LRU этого хватает, а чтения реже превращаются в записи
+ACCESS_RESOLUTION = 1.0
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение SQLite нельзя делить между потоками и процессами
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _dump(self, value):
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def _write(self, rows):
+        """Записать [(key, value, expires)] и при переполнении почистить."""
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires, accessed)"
+                " VALUES (?, ?, ?, ?)",
+                [(key, value, expires, now) for key, value, expires in rows],
+            )
+            self._cull(connection, now)
+
+    def _cull(self, connection, now):
+        (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count <= self._max_entries:
+            return
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+        (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute("DELETE FROM cache")
+            return
+        connection.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY accessed LIMIT ?"
+            ")",
+            (count // self._cull_frequency,),
+        )
+
+    def _read(self, keys):
+        """{key: value} для живых записей; отмечает их как прочитанные."""
+        now = time.time()
+        connection = self._connection()
+        found = {}
+        stale = []
+        expired = []
+        for start in range(0, len(keys), 500):
+            chunk = keys[start: start + 500]
+            rows = connection.execute(
+                "SELECT key, value, expires, accessed FROM cache"
+                " WHERE key IN (%s)" % ", ".join("?" * len(chunk)),
+                chunk,
+            )
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    expired.append((key,))
+                    continue
+                found[key] = pickle.loads(value)
+                if now - accessed > ACCESS_RESOLUTION:
+                    stale.append((now, key))
+        if expired or stale:
+            with connection:
+                connection.executemany(
+                    "DELETE FROM cache WHERE key = ?", expired
+                )
+                connection.executemany(
+                    "UPDATE cache SET accessed = ? WHERE key = ?", stale
+                )
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "DELETE FROM cache WHERE key = ? AND expires <= ?", (key, now)
+            )
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires, accessed)"
+                " VALUES (?, ?, ?, ?)",
+                (key, self._dump(value), self._expires(timeout), now),
+            )
+            if cursor.rowcount:
+                self._cull(connection, now)
+        return bool(cursor.rowcount)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        found = self._read(list(made))
+        return {made[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write([(key, self._dump(value), self._expires(timeout))])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key, self._dump(value), expires))
+        self._write(rows)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                "UPDATE cache SET expires = ?, accessed = ?"
+                " WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (self._expires(timeout), now, key, now),
+            )
+        return bool(cursor.rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        # Чтение и запись под одной блокировкой, чтобы воркеры
+        # не теряли чужие увеличения
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT value FROM cache"
+                " WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                "UPDATE cache SET value = ?, accessed = ? WHERE key = ?",
+                (self._dump(value), now, key),
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache"
+            " WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def delete_many(self, keys, version=None):
+        rows = []
+        for key in keys:
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key,))
+        connection = self._connection()
+        with connection:
+            connection.executemany("DELETE FROM cache WHERE key = ?", rows)
+
+    def clear(self):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Соединение живет весь процесс: открывать файл на каждый
+        # запрос дороже, чем держать его
+        pass
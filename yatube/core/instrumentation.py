@@ -0,0 +1,156 @@
+"""Метрики запроса: SQL, кэш и отрисовка шаблонов.
+
+RequestMetricsMiddleware собирает их для каждого запроса и при
+DEBUG=False: запросы к БД считаются через execute_wrapper, время
+шаблонов - бэкендом InstrumentedDjangoTemplates, попадания в кэш
+сообщает сам код кэширования через count_cache(). Итог уходит в
+заголовок Server-Timing и в лог core.instrumentation с именем view.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_time = 0.0
+        self.render_depth = 0
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total * 1000, 1),
+            "db_queries": self.queries,
+            "db_ms": round(self.db_time * 1000, 1),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "render_ms": round(self.render_time * 1000, 1),
+        }
+
+    def server_timing(self):
+        return ", ".join(
+            (
+                'db;dur=%.1f;desc="%d queries"'
+                % (self.db_time * 1000, self.queries),
+                'cache;desc="hits=%d misses=%d"'
+                % (self.cache_hits, self.cache_misses),
+                "render;dur=%.1f" % (self.render_time * 1000),
+                "total;dur=%.1f" % (self.total * 1000),
+            )
+        )
+
+
+def current():
+    """Метрики текущего запроса или None вне запроса."""
+    return getattr(_local, "metrics", None)
+
+
+def count_cache(hits=0, misses=0):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def _time_query(execute, sql, params, many, context):
+    metrics = current()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += time.perf_counter() - started
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return super().render(context, request)
+        # Карточки постов рисуются внутри страницы: время считаем
+        # только у внешнего шаблона
+        metrics.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.render_depth -= 1
+            if not metrics.render_depth:
+                metrics.render_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django, которые сообщают время отрисовки в метрики."""
+
+    def from_string(self, template_code):
+        template = super().from_string(template_code)
+        return InstrumentedTemplate(template.template, self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class RequestMetricsMiddleware:
+    """Считает запросы к БД, кэш и шаблоны каждого запроса.
+
+    Ставится первым в MIDDLEWARE, чтобы учесть работу остальных.
+    Запросы дольше SLOW_REQUEST_MS пишутся в лог с уровнем WARNING,
+    остальные с INFO.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = _local.metrics = RequestMetrics()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_time_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        metrics.finish()
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = metrics.server_timing()
+        self.log(request, response, metrics)
+        return response
+
+    def log(self, request, response, metrics):
+        slow = metrics.total * 1000 >= settings.SLOW_REQUEST_MS
+        level = logging.WARNING if slow else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        match = request.resolver_match
+        fields = dict(
+            view=match.view_name if match else "-",
+            method=request.method,
+            status=response.status_code,
+            **metrics.as_dict(),
+        )
+        logger.log(
+            level,
+            " ".join("%s=%s" % item for item in fields.items()),
+            extra={"request_metrics": fields},
+        )
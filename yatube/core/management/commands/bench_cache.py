@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+import random
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from core.benchmark import stopwatch, summarize
+
+BACKENDS = (
+    ("locmem", "django.core.cache.backends.locmem.LocMemCache"),
+    ("file", "django.core.cache.backends.filebased.FileBasedCache"),
+    ("sqlite", "core.cache_backends.SQLiteCache"),
+)
+
+
+def make_cache(backend, location, max_entries):
+    return import_string(backend)(
+        location, {"OPTIONS": {"MAX_ENTRIES": max_entries}}
+    )
+
+
+def serve(backend, location, max_entries, keys, requests, seed):
+    """Воркер: читает случайные ключи и кладет промахи в кэш."""
+    cache = make_cache(backend, location, max_entries)
+    rng = random.Random(seed)
+    hits = 0
+    for _ in range(requests):
+        # Страницы читаются неравномерно: первые ключи популярнее
+        key = "page.%d" % int(keys * rng.random() ** 2)
+        if cache.get(key) is None:
+            cache.set(key, "x" * 2000)
+        else:
+            hits += 1
+    return hits
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает LocMemCache, FileBasedCache и SQLiteCache: задержки "
+        "операций в одном процессе и долю попаданий, когда кэш делят "
+        "несколько воркеров."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ops", type=int, default=2000)
+        parser.add_argument("--size", type=int, default=2000)
+        parser.add_argument("--max-entries", type=int, default=10000)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--keys", type=int, default=1000)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Сколько чтений делает каждый воркер",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            "backend  op        ops/s    p50 ms   p95 ms   p99 ms"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, backend in BACKENDS:
+                cache = make_cache(
+                    backend,
+                    self.location(directory, name),
+                    options["max_entries"],
+                )
+                for op, samples in self.run_ops(cache, options):
+                    result = summarize(samples)
+                    self.stdout.write(
+                        "%-8s %-8s %7.0f  %7.3f  %7.3f  %7.3f"
+                        % (
+                            name,
+                            op,
+                            1000 / result["mean"],
+                            result["p50"],
+                            result["p95"],
+                            result["p99"],
+                        )
+                    )
+            self.stdout.write("\nbackend  workers  hit rate")
+            for name, backend in BACKENDS:
+                location = self.location(directory, name + "-shared")
+                rate = self.run_workers(backend, location, options)
+                self.stdout.write(
+                    "%-8s %7d  %7.1f%%" % (name, options["workers"], rate)
+                )
+
+    def location(self, directory, name):
+        if name.startswith("sqlite"):
+            return os.path.join(directory, name + ".sqlite3")
+        return os.path.join(directory, name)
+
+    def run_ops(self, cache, options):
+        value = "x" * options["size"]
+        keys = ["bench.%d" % number for number in range(options["ops"])]
+        timings = {"set": [], "get": [], "miss": [], "get_many": []}
+        for key in keys:
+            with stopwatch(timings["set"]):
+                cache.set(key, value)
+        for key in keys:
+            with stopwatch(timings["get"]):
+                cache.get(key)
+        for key in keys:
+            with stopwatch(timings["miss"]):
+                cache.get("missing." + key)
+        for start in range(0, len(keys), 20):
+            with stopwatch(timings["get_many"]):
+                cache.get_many(keys[start: start + 20])
+        cache.clear()
+        return timings.items()
+
+    def run_workers(self, backend, location, options):
+        workers = options["workers"]
+        arguments = [
+            (
+                backend,
+                location,
+                options["max_entries"],
+                options["keys"],
+                options["requests"],
+                seed,
+            )
+            for seed in range(workers)
+        ]
+        # У каждого процесса свой LocMemCache, поэтому одну и ту же
+        # страницу каждый воркер собирает заново
+        context = multiprocessing.get_context("fork")
+        with context.Pool(workers) as pool:
+            hits = sum(pool.starmap(serve, arguments))
+        return 100 * hits / (workers * options["requests"])
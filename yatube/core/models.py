@@ -1,4 +1,18 @@
-from django.db import models
+from django.db import models, transaction
+
+
+class AtomicSaveMixin:
+    """save() и обработчики pre_save/post_save в одной транзакции.
+
+    Django шлет post_save уже после записи строки и вне транзакции:
+    если обработчик упадет, строка останется без счетчиков и прочего,
+    что он должен был обновить. Удаление такой обертки не требует,
+    Collector и так шлет post_delete внутри транзакции.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
 
 
 class CreatedModel(models.Model):
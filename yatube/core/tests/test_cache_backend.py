@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.cache_backends import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(
+            os.path.join(self.directory, "cache.sqlite3"),
+            {"OPTIONS": options},
+        )
+
+    def test_shared_between_instances(self):
+        """Записи и очистка видны другому экземпляру с тем же файлом"""
+        other = self.make_cache()
+        self.cache.set("key", {"value": 1})
+        self.assertEqual(other.get("key"), {"value": 1})
+        other.clear()
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_timeout(self):
+        """Запись с истекшим сроком не возвращается и заменяется add()"""
+        self.cache.set("key", "old", 10)
+        with mock.patch("time.time", return_value=time.time() + 11):
+            self.assertIsNone(self.cache.get("key"))
+            self.assertFalse(self.cache.has_key("key"))
+            self.assertTrue(self.cache.add("key", "new"))
+        self.assertFalse(self.cache.add("key", "newer"))
+        self.assertEqual(self.cache.get("key"), "new")
+
+    def test_incr_and_many(self):
+        """incr, get_many, set_many и delete_many"""
+        self.cache.set_many({"a": 1, "b": 2})
+        self.assertEqual(self.cache.incr("a", 5), 6)
+        self.assertEqual(
+            self.cache.get_many(["a", "b", "c"]), {"a": 6, "b": 2}
+        )
+        with self.assertRaises(ValueError):
+            self.cache.incr("c")
+        self.cache.delete_many(["a", "b"])
+        self.assertEqual(self.cache.get_many(["a", "b"]), {})
+
+    def test_evicts_least_recently_used(self):
+        """При переполнении удаляются давно не читавшиеся записи"""
+        cache = self.make_cache(MAX_ENTRIES=4, CULL_FREQUENCY=2)
+        now = time.time()
+        for number in range(4):
+            with mock.patch("time.time", return_value=now + number * 10):
+                cache.set(number, number)
+        with mock.patch("time.time", return_value=now + 50):
+            cache.get(0)
+        with mock.patch("time.time", return_value=now + 60):
+            cache.set(4, 4)
+        self.assertEqual(sorted(cache.get_many(range(5))), [0, 3, 4])
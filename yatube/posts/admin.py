@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib import admin
 from .models import Post, Group, Follow, Comment
+from .search import matching_ids, match_expression
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,6 +11,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по индексу FTS5, а не LIKE '%...%' по всей таблице
+        if match_expression(search_term) is None:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
@@ -0,0 +1,167 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.cache import (
+    get_cache_key,
+    learn_cache_key,
+    patch_vary_headers,
+)
+from django.views.decorators.http import condition
+
+from core.instrumentation import count_cache
+
+VERSION_KEY = "posts.version.%s"
+
+
+def _initial_version():
+    # Если ключ версии вытеснен из кэша, новая версия не совпадет
+    # ни с одной из тех, под которыми уже лежат страницы
+    return int(time.time() * 1000)
+
+
+def scope_versions(scopes):
+    """Словарь область -> текущая версия, одним чтением из кэша.
+
+    Версии истекают вместе со страницами: в кэше отдельного процесса
+    bump() из других воркеров не виден, и без срока ETag этого процесса
+    не изменился бы никогда.
+    """
+    keys = {scope: VERSION_KEY % scope for scope in scopes}
+    found = cache.get_many(keys.values())
+    for key in keys.values():
+        if key not in found:
+            cache.add(
+                key, _initial_version(), settings.POSTS_PAGE_CACHE_TIMEOUT
+            )
+            found[key] = cache.get(key)
+    return {scope: found[key] for scope, key in keys.items()}
+
+
+def versions(scopes):
+    """Текущие версии областей одной строкой, например "17.3.9"."""
+    found = scope_versions(scopes)
+    return ".".join(str(found[scope]) for scope in scopes)
+
+
+def bump(*scopes):
+    """Сделать устаревшими все страницы, зависящие от областей.
+
+    Внутри транзакции версии поднимаются сразу и еще раз после
+    коммита: страница, собранная до коммита по старым данным, могла
+    успеть лечь в кэш под новой версией.
+    """
+    _bump(scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = VERSION_KEY % scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(
+                key, _initial_version(), settings.POSTS_PAGE_CACHE_TIMEOUT
+            )
+
+
+def post_scopes(post, previous_group_id=None):
+    """Области страниц, на которых виден пост."""
+    scopes = ["all", "author:%s" % post.author_id, "post:%s" % post.pk]
+    for group_id in {post.group_id, previous_group_id} - {None}:
+        scopes.append("group:%s" % group_id)
+    return scopes
+
+
+def card_scopes(post):
+    """Области карточки поста: имя автора и название группы.
+
+    Отдельные от author: и group:, которые поднимает каждый новый пост,
+    иначе одна публикация сбрасывала бы все карточки автора.
+    """
+    scopes = ["card.author:%s" % post.author_id]
+    if post.group_id is not None:
+        scopes.append("card.group:%s" % post.group_id)
+    return scopes
+
+
+def _page_scopes(request, scopes, args, kwargs):
+    # Области нужны и ETag, и кэшу страниц: считаем их один раз
+    if not hasattr(request, "_page_scopes"):
+        request._page_scopes = scopes(request, *args, **kwargs)
+    return request._page_scopes
+
+
+def page_etag(scopes):
+    """Функция ETag для condition() по версиям областей страницы.
+
+    Кроме версий в тег входят кука сессии (шапка страницы зависит от
+    пользователя) и Accept (формат миниатюр), поэтому проверка не
+    трогает БД, кроме запросов внутри scopes.
+    """
+
+    def etag(request, *args, **kwargs):
+        page_scopes = _page_scopes(request, scopes, args, kwargs)
+        if page_scopes is None:
+            return None
+        parts = (
+            versions(page_scopes),
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME, ""),
+            request.META.get("HTTP_ACCEPT", ""),
+        )
+        return hashlib.md5("\n".join(parts).encode()).hexdigest()
+
+    return etag
+
+
+def conditional_page(scopes):
+    """Отвечает 304 Not Modified, если у клиента актуальная страница."""
+    return condition(etag_func=page_etag(scopes))
+
+
+def versioned_cache_page(scopes):
+    """Кэширует страницу, пока не изменится версия ее областей.
+
+    scopes(request, *args, **kwargs) возвращает список областей или
+    None, если кэшировать нечего (например, объект не найден). Страница
+    живет до POSTS_PAGE_CACHE_TIMEOUT, но после bump() любой из
+    областей собирается заново.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            page_scopes = _page_scopes(request, scopes, args, kwargs)
+            if page_scopes is None:
+                return view(request, *args, **kwargs)
+            key_prefix = "posts.page." + versions(page_scopes)
+            cache_key = get_cache_key(request, key_prefix, "GET", cache)
+            if cache_key is not None:
+                response = cache.get(cache_key)
+                if response is not None:
+                    count_cache(hits=1)
+                    return response
+            count_cache(misses=1)
+            response = view(request, *args, **kwargs)
+            # Шапка страницы зависит от пользователя, а Vary: Cookie от
+            # SessionMiddleware появится уже после кэширования. Формат
+            # миниатюр выбирается по Accept
+            patch_vary_headers(response, ("Cookie", "Accept"))
+            if response.status_code == 200 and not response.cookies:
+                timeout = settings.POSTS_PAGE_CACHE_TIMEOUT
+                cache_key = learn_cache_key(
+                    request, response, timeout, key_prefix, cache
+                )
+                cache.set(cache_key, response, timeout)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,103 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+logger = logging.getLogger(__name__)
+
+
+def _add(queryset, field, delta):
+    if delta >= 0:
+        return queryset.update(**{field: F(field) + delta})
+    updated = queryset.filter(**{field + "__gte": -delta}).update(
+        **{field: F(field) + delta}
+    )
+    if not updated and queryset.exists():
+        # Счетчик меньше, чем строк удаляется: их создали в обход save()
+        # (bulk_create) или счетчик разошелся. Удаление из-за этого не
+        # отменяем, а сообщаем, что пора запустить rebuild_counters
+        logger.warning(
+            "Счетчик %s.%s разошелся с данными, нужен rebuild_counters",
+            queryset.model._meta.label,
+            field,
+        )
+    return updated
+
+
+def _add_user(user_id, field, delta):
+    updated = _add(UserStats.objects.filter(user=user_id), field, delta)
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        _add(UserStats.objects.filter(user=user_id), field, delta)
+
+
+def stats_for(user_id):
+    """Счетчики пользователя; нули, если он еще ничего не делал."""
+    return UserStats.objects.filter(user=user_id).first() or UserStats(
+        user_id=user_id
+    )
+
+
+def post_saved(post, created, previous_group_id):
+    if not created and previous_group_id == post.group_id:
+        return
+    with transaction.atomic():
+        if created:
+            _add_user(post.author_id, "posts_count", 1)
+        else:
+            _add(Group.objects.filter(pk=previous_group_id), "posts_count", -1)
+        _add(Group.objects.filter(pk=post.group_id), "posts_count", 1)
+
+
+def post_deleted(post):
+    with transaction.atomic():
+        _add_user(post.author_id, "posts_count", -1)
+        _add(Group.objects.filter(pk=post.group_id), "posts_count", -1)
+
+
+def comment_changed(comment, delta):
+    _add(Post.objects.filter(pk=comment.post_id), "comments_count", delta)
+
+
+def follow_changed(follow, delta):
+    with transaction.atomic():
+        _add_user(follow.author_id, "followers_count", delta)
+        _add_user(follow.user_id, "following_count", delta)
+
+
+def _count(queryset, field, outer="pk"):
+    """Подзапрос с числом строк queryset на каждую строку внешней модели."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(outer)})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+@transaction.atomic
+def rebuild():
+    """Пересчитать все счетчики по данным в таблицах."""
+    Group.objects.update(posts_count=_count(Post.objects, "group"))
+    Post.objects.update(comments_count=_count(Comment.objects, "post"))
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(stats=None).values_list(
+                "pk", flat=True
+            )
+        ),
+        batch_size=500,
+    )
+    UserStats.objects.update(
+        posts_count=_count(Post.objects, "author", "user"),
+        followers_count=_count(Follow.objects, "author", "user"),
+        following_count=_count(Follow.objects, "user", "user"),
+    )
@@ -0,0 +1,186 @@
+import heapq
+
+from django.conf import settings
+from django.db import connection
+from django.utils.functional import cached_property
+
+from .models import FeedEntry, Follow, Post, UserStats
+from .paginators import seek
+
+FANOUT_BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    """Посты автора не раскладываются по лентам, а читаются при показе."""
+    return UserStats.objects.filter(
+        user=author_id,
+        followers_count__gte=settings.FEED_FANOUT_THRESHOLD,
+    ).exists()
+
+
+def fan_out(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(author=post.author_id).values_list(
+        "user_id", flat=True
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавить в ленту последние посты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author=author_id).values_list(
+        "id", "pub_date"
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts[: settings.FEED_BACKFILL_LIMIT]
+        ),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_ids, after_follow_id=0):
+    """Заполнить ленты подписчиков авторов одним INSERT ... SELECT.
+
+    То же, что backfill() для каждой подписки с id больше
+    after_follow_id, но без запросов на подписку: последние
+    FEED_BACKFILL_LIMIT постов каждого автора выбирает ROW_NUMBER(),
+    знаменитости отсеиваются по UserStats. Возвращает число новых строк.
+    """
+    if not author_ids:
+        return 0
+    ops = connection.ops
+    sql = """
+        %(insert)s %(feed)s (user_id, post_id, pub_date)
+        SELECT follow.user_id, post.id, post.pub_date
+        FROM %(follow)s follow
+        JOIN (
+            SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+            ) AS position
+            FROM %(post)s
+            WHERE author_id IN (%(authors)s)
+        ) post ON post.author_id = follow.author_id
+        LEFT JOIN %(stats)s stats ON stats.user_id = follow.author_id
+        WHERE follow.id > %%s
+            AND post.position <= %%s
+            AND COALESCE(stats.followers_count, 0) < %%s
+        %(ignore)s
+    """ % {
+        "insert": ops.insert_statement(ignore_conflicts=True),
+        "feed": FeedEntry._meta.db_table,
+        "follow": Follow._meta.db_table,
+        "post": Post._meta.db_table,
+        "stats": UserStats._meta.db_table,
+        "authors": ", ".join(["%s"] * len(author_ids)),
+        "ignore": ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    }
+    params = [
+        *author_ids,
+        after_follow_id,
+        settings.FEED_BACKFILL_LIMIT,
+        settings.FEED_FANOUT_THRESHOLD,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def purge(user_id, author_id):
+    """Убрать из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(user=user_id, post__author=author_id).delete()
+    if UserStats.objects.filter(
+        user=author_id,
+        followers_count=settings.FEED_FANOUT_THRESHOLD - 1,
+    ).exists():
+        # Автор перестал быть знаменитостью: его посты больше не
+        # подтягиваются при чтении, поэтому раскладываем их заранее.
+        followers = Follow.objects.filter(author=author_id).values_list(
+            "user_id", flat=True
+        )
+        for follower_id in followers.iterator():
+            backfill(follower_id, author_id)
+
+
+def _newest_first(post):
+    return post.pub_date, post.pk
+
+
+class FollowFeed:
+    """Лента подписок пользователя для CursorPaginator.
+
+    Ведет себя как список постов: count() и срезы для ?page=N,
+    seek() для курсоров. Посты обычных авторов берутся из FeedEntry,
+    посты авторов с FEED_FANOUT_THRESHOLD и больше подписчиков
+    подтягиваются при чтении и сливаются по pub_date.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.entries = FeedEntry.objects.filter(user=user).select_related(
+            "post__author", "post__group"
+        )
+
+    @cached_property
+    def pulled(self):
+        """Посты знаменитостей или None, если пользователь на них
+        не подписан."""
+        celebrities = list(
+            Follow.objects.filter(
+                user=self.user,
+                author__stats__followers_count__gte=(
+                    settings.FEED_FANOUT_THRESHOLD
+                ),
+            ).values_list("author_id", flat=True)
+        )
+        if not celebrities:
+            return None
+        # Посты, попавшие в ленту до того, как автор стал знаменитостью,
+        # уже есть в FeedEntry
+        return (
+            Post.objects.filter(author__in=celebrities)
+            .exclude(feed_entries__user=self.user)
+            .select_related("author", "group")
+            .order_by("-pub_date", "-id")
+        )
+
+    def count(self):
+        total = self.entries.count()
+        if self.pulled is not None:
+            total += self.pulled.count()
+        return total
+
+    def __getitem__(self, index):
+        if self.pulled is None:
+            return [entry.post for entry in self.entries[index]]
+        merged = heapq.merge(
+            [entry.post for entry in self.entries[: index.stop]],
+            self.pulled[: index.stop],
+            key=_newest_first,
+            reverse=True,
+        )
+        return list(merged)[index]
+
+    def seek(self, key, older, limit):
+        entries = seek(
+            self.entries, key, older, limit, fields=("pub_date", "post_id")
+        )
+        pushed = [entry.post for entry in entries]
+        if self.pulled is None:
+            return pushed
+        pulled = seek(self.pulled, key, older, limit)
+        merged = heapq.merge(pushed, pulled, key=_newest_first, reverse=older)
+        return list(merged)[:limit]
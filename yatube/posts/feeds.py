@@ -0,0 +1,127 @@
+"""RSS и Atom ленты: все посты, группа и автор.
+
+Ленты кэшируются и отвечают 304 так же, как HTML-страницы тех же
+областей (см. posts.cache), поэтому частый опрос почти не доходит
+до БД.
+"""
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from .cache import conditional_page, versioned_cache_page
+from .models import Group, Post, User
+from .views import group_scopes, profile_scopes
+
+FEED_ITEMS = 20
+
+
+class PostsFeed(Feed):
+    title = "Yatube: новые посты"
+    description = "Последние посты всех авторов"
+
+    def link(self):
+        return reverse("posts:index")
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj=None):
+        # Та же сортировка, что у лент на сайте: читается по индексу
+        return (
+            self.posts(obj)
+            .select_related("author", "group")
+            .order_by("-pub_date", "-id")[:FEED_ITEMS]
+        )
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(60)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse("posts:post_detail", args=(item.pk,))
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return (item.group.title,) if item.group else ()
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return "Yatube: %s" % obj.title
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse("posts:list", args=(obj.slug,))
+
+    def posts(self, obj):
+        return Post.objects.filter(group=obj)
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return "Yatube: посты %s" % (obj.get_full_name() or obj.username)
+
+    def description(self, obj):
+        return "Последние посты автора %s" % obj.username
+
+    def link(self, obj):
+        return reverse("posts:profile", args=(obj.username,))
+
+    def posts(self, obj):
+        return Post.objects.filter(author=obj)
+
+
+class PostsAtomFeed(PostsFeed):
+    feed_type = Atom1Feed
+    subtitle = PostsFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return obj.description
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+def cached_feed(feed, scopes):
+    """Представление ленты с кэшем страниц и условным GET."""
+    return conditional_page(scopes)(versioned_cache_page(scopes)(feed))
+
+
+def all_scopes(request):
+    return ["all"]
+
+
+posts_rss = cached_feed(PostsFeed(), all_scopes)
+posts_atom = cached_feed(PostsAtomFeed(), all_scopes)
+group_rss = cached_feed(GroupFeed(), group_scopes)
+group_atom = cached_feed(GroupAtomFeed(), group_scopes)
+author_rss = cached_feed(AuthorFeed(), profile_scopes)
+author_atom = cached_feed(AuthorAtomFeed(), profile_scopes)
@@ -1,5 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 from .models import Post, Comment
+from . import images, thumbnails
 
 
 class PostForm(forms.ModelForm):
@@ -16,6 +19,27 @@ class PostForm(forms.ModelForm):
         text = self.changed_data("text")
         return text
 
+    def clean_image(self):
+        image = self.cleaned_data.get("image")
+        if not isinstance(image, UploadedFile):
+            return image
+        image, *self.image_size = images.normalize(image)
+        return image
+
+    def save(self, commit=True):
+        if "image" in self.changed_data:
+            self.instance.image_width, self.instance.image_height = getattr(
+                self, "image_size", (None, None)
+            )
+        post = super().save(commit)
+        if commit and "image" in self.changed_data and post.image:
+            # Миниатюры готовятся заранее, чтобы их не ждал первый
+            # читатель; файл должен быть сохранен до запуска потока
+            transaction.on_commit(
+                lambda: thumbnails.generate_later(post.image)
+            )
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import Signal
+from django.template.loader import render_to_string
+
+from .cache import card_scopes, scope_versions
+
+CARD_TEMPLATE = "posts/includes/post_card.html"
+
+# Отправляется после сборки карточек страницы: hits и misses - сколько
+# карточек нашлось в кэше и сколько пришлось отрисовать
+post_cards_rendered = Signal(providing_args=["hits", "misses"])
+
+
+def card_key(post, versions, size, webp=False):
+    return "posts.card.%s.%s.%s.%s%s" % (
+        post.pk,
+        post.updated.timestamp(),
+        ".".join(str(versions[scope]) for scope in card_scopes(post)),
+        size,
+        ".webp" if webp else "",
+    )
+
+
+def render_post_cards(posts, size, webp=False):
+    """HTML карточек постов с размером картинки size.
+
+    Все карточки страницы читаются из кэша одним get_many, заново
+    рисуются только недостающие. Ключ включает время изменения поста и
+    версии его автора и группы, поэтому правка поста, переименование
+    автора или группы сразу дают новую карточку.
+    """
+    versions = scope_versions(
+        {scope for post in posts for scope in card_scopes(post)}
+    )
+    keys = [card_key(post, versions, size, webp) for post in posts]
+    cards = cache.get_many(keys)
+    missed = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            missed[key] = render_to_string(
+                CARD_TEMPLATE, {"post": post, "size": size, "webp": webp}
+            )
+    if missed:
+        cache.set_many(missed, settings.POSTS_PAGE_CACHE_TIMEOUT)
+        cards.update(missed)
+    post_cards_rendered.send(
+        sender=None, hits=len(keys) - len(missed), misses=len(missed)
+    )
+    return [cards[key] for key in keys]
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete
+
+from . import thumbnails
+from .models import Post
+from .storage import image_storage
+
+# Файлы моложе стольких секунд release не удаляет: хранилище могло
+# только что отдать имя новому посту, который еще не сохранен. Такие
+# файлы без ссылок потом уберет gc_media
+RELEASE_MIN_AGE = 60
+
+# Форматы, которые хранятся как есть; остальные (например, MPO со
+# смартфонов) пересохраняются в JPEG
+SAVE_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+
+
+def _needs_rewrite(image, max_edge):
+    if max(image.size) > max_edge:
+        return True
+    if image.format not in SAVE_FORMATS:
+        return True
+    # EXIF с геометкой и поворотом, комментарии и превью внутри файла
+    return bool(image.getexif()) or "exif" in image.info
+
+
+def normalize(upload):
+    """Подготовить загруженную картинку к хранению.
+
+    Возвращает (файл, ширина, высота). Картинка больше IMAGE_MAX_PIXELS
+    отклоняется по заголовку, до декодирования. Остальные поворачиваются
+    по EXIF, теряют метаданные и уменьшаются до IMAGE_MAX_EDGE по большей
+    стороне. Если делать нечего, возвращается исходный файл: лишнее
+    пережатие JPEG только портит качество.
+    """
+    max_edge = settings.IMAGE_MAX_EDGE
+    upload.seek(0)
+    with Image.open(upload) as image:
+        width, height = image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                "Картинка слишком большая: %(width)s×%(height)s.",
+                code="image_too_large",
+                params={"width": width, "height": height},
+            )
+        if getattr(image, "is_animated", False) or not _needs_rewrite(
+            image, max_edge
+        ):
+            upload.seek(0)
+            return upload, width, height
+        save_format = image.format if image.format in SAVE_FORMATS else "JPEG"
+        icc_profile = image.info.get("icc_profile")
+        # JPEG сразу декодируется в уменьшенном масштабе
+        image.draft(image.mode, (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=2.0)
+        if save_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        name = os.path.splitext(upload.name)[0] + EXTENSIONS[save_format]
+        # Файл на диске без имени: хранилище перепишет его кусками
+        result = UploadedFile(
+            tempfile.TemporaryFile(), name, "image/" + save_format.lower()
+        )
+        params = {"optimize": True}
+        if save_format in ("JPEG", "WEBP"):
+            params["quality"] = settings.IMAGE_QUALITY
+        if icc_profile:
+            params["icc_profile"] = icc_profile
+        # exif не передается, поэтому в новый файл он не попадет
+        image.save(result, save_format, **params)
+        result.size = result.tell()
+        result.seek(0)
+        return result, image.width, image.height
+
+
+def release(name):
+    """Удалить файл картинки и ее миниатюры, если ссылок больше нет.
+
+    Файл с именем-хешем может принадлежать нескольким постам; ссылки на
+    него считаются по индексу Post.image. Файлы со старыми именами и
+    чужие пути не трогаем: раньше посты свои файлы не удаляли. Недавно
+    записанный или повторно выданный файл тоже остается: см.
+    RELEASE_MIN_AGE.
+    """
+    if not image_storage.is_hashed(name):
+        return False
+    if Post.objects.filter(image=name).exists():
+        return False
+    try:
+        modified = os.path.getmtime(image_storage.path(name))
+    except FileNotFoundError:
+        modified = 0
+    if modified > time.time() - RELEASE_MIN_AGE:
+        return False
+    delete(thumbnails.source(name))
+    return True
@@ -0,0 +1,184 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.benchmark import benchmark_database, stopwatch, summarize
+from posts.models import PATH_SEGMENT, Comment, Post, User
+from posts.paginators import CommentPaginator
+from posts.threads import path_for, subtree
+from posts.views import COMMENTS_PER_PAGE
+
+# Без пути порядок показа приходится собирать в самом запросе
+RECURSIVE_SQL = """
+    WITH RECURSIVE thread(id, sort) AS (
+        SELECT id, printf('%%010d', id) FROM posts_comment WHERE {roots}
+        UNION ALL
+        SELECT c.id, t.sort || printf('%%010d', c.id)
+        FROM posts_comment c JOIN thread t ON c.parent_id = t.id
+    )
+    SELECT posts_comment.* FROM posts_comment JOIN thread USING (id)
+    ORDER BY thread.sort {limit}
+"""
+
+
+def by_levels(root):
+    """Ветка без пути: запрос на каждый уровень, как в adjacency list."""
+    rows, level = [root], [root.pk]
+    while level:
+        children = list(Comment.objects.filter(parent__in=level))
+        rows.extend(children)
+        level = [child.pk for child in children]
+    return rows
+
+
+def recursive(root):
+    """Ветка без пути одним рекурсивным запросом (WITH RECURSIVE)."""
+    sql = RECURSIVE_SQL.format(roots="id = %s", limit="")
+    return list(Comment.objects.raw(sql, [root.pk]))
+
+
+def recursive_page(post):
+    """Первая страница комментариев поста через WITH RECURSIVE.
+
+    Корни идут от новых к старым, как в path, но чтобы отсортировать
+    страницу, дерево поста приходится обойти целиком.
+    """
+    sql = RECURSIVE_SQL.format(
+        roots="post_id = %s AND parent_id IS NULL",
+        limit="LIMIT %s",
+    ).replace("printf('%%010d', id)", "printf('%%010d', 9999999999 - id)")
+    return list(Comment.objects.raw(sql, [post.pk, COMMENTS_PER_PAGE]))
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает чтение ветки комментариев по materialized path с "
+        "adjacency list (запрос на уровень и WITH RECURSIVE) на глубоких "
+        "и широких ветках. Работает на временной тестовой БД."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--depth", type=int, default=20, help="Глубина цепочки ответов"
+        )
+        parser.add_argument(
+            "--roots", type=int, default=200, help="Веток в широком посте"
+        )
+        parser.add_argument(
+            "--width", type=int, default=50, help="Ответов в каждой ветке"
+        )
+        parser.add_argument("--reads", type=int, default=50)
+
+    def handle(self, *args, **options):
+        max_length = Comment._meta.get_field("path").max_length
+        max_depth = max_length // PATH_SEGMENT - 1
+        if options["depth"] > max_depth:
+            raise CommandError(
+                "Глубина больше %d не влезет в path" % max_depth
+            )
+        with benchmark_database():
+            author = User.objects.create(username="bench")
+            deep_post = Post.objects.create(author=author, text="Глубокий")
+            wide_post = Post.objects.create(author=author, text="Широкий")
+            deep_root = self.deep(deep_post, author, options["depth"])
+            wide_roots = self.wide(
+                wide_post, author, options["roots"], options["width"]
+            )
+            self.stdout.write(
+                "case          method      rows  queries  p50 ms  p95 ms"
+            )
+            cases = (
+                ("deep chain", deep_root),
+                ("wide thread", wide_roots[len(wide_roots) // 2]),
+            )
+            methods = (
+                ("path", lambda root: list(subtree(root))),
+                ("levels", by_levels),
+                ("recursive", recursive),
+            )
+            for case, root in cases:
+                for method, read in methods:
+                    self.measure(case, method, lambda: read(root), options)
+            paginator = CommentPaginator(
+                wide_post.comments.select_related("author"),
+                COMMENTS_PER_PAGE,
+            )
+            self.measure("wide post", "path", paginator.first_page, options)
+            self.measure(
+                "wide post",
+                "recursive",
+                lambda: recursive_page(wide_post),
+                options,
+            )
+
+    def measure(self, case, method, read, options):
+        with CaptureQueriesContext(connection) as queries:
+            rows = read()
+        samples = []
+        for _ in range(options["reads"]):
+            with stopwatch(samples):
+                read()
+        result = summarize(samples)
+        self.stdout.write(
+            "%-12s  %-9s  %5d  %7d  %6.2f  %6.2f"
+            % (
+                case,
+                method,
+                len(rows),
+                len(queries),
+                result["p50"],
+                result["p95"],
+            )
+        )
+
+    def deep(self, post, author, depth):
+        """Цепочка: каждый комментарий отвечает на предыдущий."""
+        next_id = self.next_id()
+        comments, parent = [], None
+        for level in range(depth + 1):
+            comment = Comment(
+                id=next_id + level,
+                post=post,
+                author=author,
+                text="Уровень %s" % level,
+                parent=parent,
+                path=path_for(next_id + level, parent.path if parent else ""),
+            )
+            comments.append(comment)
+            parent = comment
+        Comment.objects.bulk_create(comments)
+        return comments[0]
+
+    def wide(self, post, author, roots, width):
+        """Много веток, в каждой width ответов на корень."""
+        next_id = self.next_id()
+        comments, tops = [], []
+        for number in range(roots):
+            top = Comment(
+                id=next_id,
+                post=post,
+                author=author,
+                text="Ветка %s" % number,
+                path=path_for(next_id),
+            )
+            next_id += 1
+            comments.append(top)
+            tops.append(top)
+            for reply in range(width):
+                comments.append(
+                    Comment(
+                        id=next_id,
+                        post=post,
+                        author=author,
+                        text="Ответ %s" % reply,
+                        parent=top,
+                        path=path_for(next_id, top.path),
+                    )
+                )
+                next_id += 1
+        Comment.objects.bulk_create(comments, batch_size=500)
+        return tops
+
+    def next_id(self):
+        last = Comment.objects.order_by("-id").values_list("id", flat=True)
+        return (last.first() or 0) + 1
@@ -0,0 +1,106 @@
+import itertools
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.benchmark import benchmark_database, stopwatch, summarize
+from posts import counters
+from posts.models import FeedEntry, Follow, Post, User
+
+PUSH_ONLY_THRESHOLD = 10 ** 9
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает ленту подписок в режимах push, hybrid и pull: "
+        "сколько строк FeedEntry пишется на пост и сколько стоит чтение "
+        "/follow/. Работает на временной тестовой БД."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--followers", type=int, default=200)
+        parser.add_argument("--celebrities", type=int, default=2)
+        parser.add_argument("--authors", type=int, default=20)
+        parser.add_argument(
+            "--follows",
+            type=int,
+            default=5,
+            help="На скольких обычных авторов подписан каждый читатель",
+        )
+        parser.add_argument("--posts", type=int, default=5)
+        parser.add_argument("--reads", type=int, default=50)
+        parser.add_argument("--threshold", type=int, default=100)
+
+    def handle(self, *args, **options):
+        modes = (
+            ("push", PUSH_ONLY_THRESHOLD),
+            ("hybrid", options["threshold"]),
+            ("pull", 0),
+        )
+        self.stdout.write(
+            "mode    threshold  posts  feed rows  rows/post  "
+            "write p50/p95 ms  read p50/p95 ms"
+        )
+        with benchmark_database():
+            for mode, threshold in modes:
+                with override_settings(FEED_FANOUT_THRESHOLD=threshold):
+                    result = self.run_mode(options)
+                write, read = result["write"], result["read"]
+                self.stdout.write(
+                    "%-7s %9s  %5d  %9d  %9.1f  %7.2f / %-7.2f  "
+                    "%6.2f / %.2f"
+                    % (
+                        mode,
+                        threshold if threshold != PUSH_ONLY_THRESHOLD else "-",
+                        result["posts"],
+                        result["rows"],
+                        result["rows"] / max(result["posts"], 1),
+                        write["p50"],
+                        write["p95"],
+                        read["p50"],
+                        read["p95"],
+                    )
+                )
+
+    def run_mode(self, options):
+        User.objects.all().delete()
+        followers = self.create_users("reader", options["followers"])
+        celebrities = self.create_users("star", options["celebrities"])
+        authors = self.create_users("author", options["authors"])
+        # bulk_create не шлет сигналы: подписки не заполняют ленты,
+        # а followers_count выставит rebuild()
+        regular = itertools.cycle(authors)
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author)
+            for reader in followers
+            for author in celebrities
+            + [next(regular) for _ in range(options["follows"])]
+        )
+        counters.rebuild()
+        write_samples = []
+        for author in celebrities + authors:
+            for number in range(options["posts"]):
+                with stopwatch(write_samples):
+                    Post.objects.create(
+                        author=author, text="Пост %s" % number
+                    )
+        read_samples = []
+        client = Client()
+        for reader in followers[: options["reads"]]:
+            client.force_login(reader)
+            with stopwatch(read_samples):
+                client.get(reverse("posts:follow_index"))
+        return {
+            "posts": len(write_samples),
+            "rows": FeedEntry.objects.count(),
+            "write": summarize(write_samples),
+            "read": summarize(read_samples),
+        }
+
+    def create_users(self, prefix, count):
+        User.objects.bulk_create(
+            User(username="%s%s" % (prefix, number)) for number in range(count)
+        )
+        return list(User.objects.filter(username__startswith=prefix))
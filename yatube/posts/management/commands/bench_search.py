@@ -0,0 +1,121 @@
+import itertools
+import random
+
+from django.core.management.base import BaseCommand
+
+from core.benchmark import benchmark_database, stopwatch, summarize
+from posts.models import Post, User
+from posts.search import SearchResults
+
+WORDS = (
+    "кот пес город река лес поле море гора дом сад мост поезд окно "
+    "книга письмо песня зима лето осень весна утро вечер ночь день "
+    "дорога ветер дождь снег солнце луна звезда облако остров берег"
+).split()
+SYLLABLES = "ба ве го ди ка ло ми но пу ра се ти фа ху ча ше".split()
+VOCABULARY = WORDS + [
+    first + second + third
+    for first in SYLLABLES
+    for second in SYLLABLES
+    for third in SYLLABLES
+]
+# Частоты слов в текстах убывают по закону Ципфа
+CUM_WEIGHTS = list(
+    itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1))
+)
+PER_PAGE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает поиск по индексу FTS5 с LIKE '%...%' по таблице "
+        "постов: первая страница, следующая по курсору и подсчет. "
+        "Работает на временной тестовой БД."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--batch", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.fill(options["posts"], options["batch"])
+            rng = random.Random(1)
+            queries = [
+                " ".join(rng.sample(WORDS, rng.choice((1, 2))))
+                for _ in range(options["queries"])
+            ]
+            # Следующая страница меряется только у запросов, у которых
+            # есть первая: на маленькой базе редкие слова не находятся
+            self.last_on_first_page = {}
+            for query in queries:
+                page = self.fts_page(query)
+                if page:
+                    self.last_on_first_page[query] = page[-1]
+            self.stdout.write("method        p50 ms    p95 ms    p99 ms")
+            for name, run, sampled in (
+                ("fts page", self.fts_page, queries),
+                ("fts next", self.fts_next, list(self.last_on_first_page)),
+                ("fts count", self.fts_count, queries),
+                ("like page", self.like_page, queries),
+                ("like count", self.like_count, queries),
+            ):
+                if not sampled:
+                    self.stdout.write(
+                        "%-10s  нет запросов с результатами" % name
+                    )
+                    continue
+                samples = []
+                for query in sampled:
+                    with stopwatch(samples):
+                        run(query)
+                result = summarize(samples)
+                self.stdout.write(
+                    "%-10s  %8.2f  %8.2f  %8.2f"
+                    % (name, result["p50"], result["p95"], result["p99"])
+                )
+
+    def fill(self, total, batch):
+        author = User.objects.create(username="bench")
+        rng = random.Random(0)
+        # Индекс пополняется триггерами прямо во время bulk_create
+        for start in range(0, total, batch):
+            Post.objects.bulk_create(
+                Post(
+                    author=author,
+                    text=" ".join(
+                        rng.choices(
+                            VOCABULARY,
+                            cum_weights=CUM_WEIGHTS,
+                            k=rng.randint(5, 40),
+                        )
+                    ),
+                )
+                for _ in range(min(batch, total - start))
+            )
+        self.stdout.write("Постов: %d" % total)
+
+    def fts_page(self, query):
+        return list(SearchResults(query)[0:PER_PAGE])
+
+    def fts_next(self, query):
+        last = self.last_on_first_page[query]
+        return SearchResults(query).seek(
+            (last.pub_date, last.pk), True, PER_PAGE + 1
+        )
+
+    def fts_count(self, query):
+        return SearchResults(query).count()
+
+    def like(self, query):
+        posts = Post.objects.all()
+        for word in query.split():
+            posts = posts.filter(text__icontains=word)
+        return posts
+
+    def like_page(self, query):
+        return list(self.like(query).order_by("-pub_date")[:PER_PAGE])
+
+    def like_count(self, query):
+        return self.like(query).count()
@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from sorl.thumbnail.engines.pil_engine import Engine as SorlEngine
+from sorl.thumbnail.parsers import parse_geometry
+
+from core.benchmark import stopwatch, summarize
+from posts.thumbnail_engine import Engine
+
+OPTIONS = {
+    "colorspace": "RGB",
+    "upscale": False,
+    "crop": False,
+    "cropbox": None,
+    "rounded": None,
+    "padding": False,
+    "padding_color": "#ffffff",
+}
+
+
+class _Source:
+    """Минимальная замена ImageFile sorl для чтения с диска."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+def make_thumbnail(engine, path, size, format_, quality):
+    """Миниатюра и сколько пикселей пришлось декодировать."""
+    with open(path, "rb") as file:
+        source = _Source(path, file.read())
+    options = dict(OPTIONS, format=format_, quality=quality)
+    image = engine.get_image(source)
+    ratio = engine.get_image_ratio(image, options)
+    geometry = parse_geometry(size, ratio)
+    thumbnail = engine.create(image, geometry, options)
+    data = engine._get_raw_data(thumbnail, format_, quality, {})
+    return data, image.size[0] * image.size[1]
+
+
+def run_engine(engine_class, format_, quality, paths, sizes):
+    engine = engine_class()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    samples, pixels, output = [], [], []
+    for path in paths:
+        for size in sizes:
+            with stopwatch(samples):
+                data, decoded = make_thumbnail(
+                    engine, path, size, format_, quality
+                )
+            pixels.append(decoded)
+            output.append(len(data))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    return samples, pixels, output, peak
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает стандартный движок sorl-thumbnail с движком, "
+        "который декодирует JPEG в уменьшенном масштабе, и WebP-варианты "
+        "с JPEG: время на миниатюру, декодированные пиксели, размер "
+        "файла и прирост пиковой памяти."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corpus",
+            default=os.path.join(settings.MEDIA_ROOT, "posts"),
+            help="Папка с картинками",
+        )
+        parser.add_argument(
+            "--synthetic",
+            type=int,
+            default=0,
+            help="Добавить столько снимков 4032x3024, как с телефона",
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        sizes = list(settings.POST_THUMBNAIL_SIZES.values())
+        with tempfile.TemporaryDirectory() as directory:
+            paths = self.corpus(options["corpus"])
+            paths += self.synthetic(directory, options["synthetic"])
+            if not paths:
+                raise CommandError(
+                    "В %s нет картинок; укажите --corpus или --synthetic"
+                    % options["corpus"]
+                )
+            paths *= options["repeat"]
+            self.stdout.write(
+                "Картинок: %d, размеры: %s"
+                % (len(paths) // options["repeat"], ", ".join(sizes))
+            )
+            self.stdout.write(
+                "variant       p50 ms   p95 ms   p99 ms   Mpx decoded  "
+                "KB out  peak RSS MB"
+            )
+            context = multiprocessing.get_context("fork")
+            webp_quality = settings.THUMBNAIL_WEBP_QUALITY
+            variants = (
+                ("sorl", SorlEngine, "JPEG", 95),
+                ("draft", Engine, "JPEG", 95),
+                ("draft webp", Engine, "WEBP", webp_quality),
+            )
+            for name, engine_class, format_, quality in variants:
+                # Каждый вариант в своем процессе, чтобы пиковая
+                # память одного не маскировала другой
+                with context.Pool(1) as pool:
+                    samples, pixels, output, peak = pool.apply(
+                        run_engine,
+                        (engine_class, format_, quality, paths, sizes),
+                    )
+                result = summarize(samples)
+                self.stdout.write(
+                    "%-10s  %7.2f  %7.2f  %7.2f  %11.2f  %6.1f  %11.1f"
+                    % (
+                        name,
+                        result["p50"],
+                        result["p95"],
+                        result["p99"],
+                        sum(pixels) / len(pixels) / 1e6,
+                        sum(output) / len(output) / 1024,
+                        peak / 1024,
+                    )
+                )
+
+    def corpus(self, directory):
+        # Загрузки лежат в posts/<xx>/<sha256>.<ext>, поэтому обходится
+        # все дерево, а не только сама папка
+        paths = []
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                try:
+                    with Image.open(path) as image:
+                        image.verify()
+                except Exception:
+                    continue
+                paths.append(path)
+        return paths
+
+    def synthetic(self, directory, count):
+        paths = []
+        for number in range(count):
+            noise = Image.effect_noise((1008, 756), 64).convert("RGB")
+            image = noise.resize((4032, 3024), Image.BICUBIC)
+            path = os.path.join(directory, "phone%d.jpg" % number)
+            image.save(path, "JPEG", quality=90)
+            paths.append(path)
+        return paths
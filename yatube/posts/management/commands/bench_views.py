@@ -0,0 +1,218 @@
+import datetime
+import json
+import random
+import statistics
+import tempfile
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.benchmark import benchmark_database, stopwatch, summarize
+from posts.models import Comment, Follow, Group, Post, User
+
+VIEWS = (
+    "index",
+    "group_list",
+    "profile",
+    "post_detail",
+    "follow_index",
+    "post_create",
+    "add_comment",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает синтетические данные во временную тестовую БД и "
+        "меряет страницы через тестовый клиент: p50/p95/p99 и число "
+        "запросов к БД. Результат пишется в JSON, с --baseline "
+        "сравнивается с прошлым запуском."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--data",
+            help="Папка от generate_data или export_data; без нее "
+            "генерируется набор generate_data по умолчанию",
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument(
+            "--view",
+            action="append",
+            dest="views",
+            choices=VIEWS,
+            help="Мерить только эти страницы, можно несколько",
+        )
+        parser.add_argument("--output", default="bench_views.json")
+        parser.add_argument(
+            "--baseline", help="JSON прошлого запуска для сравнения"
+        )
+        parser.add_argument(
+            "--cache",
+            choices=("cold", "warm"),
+            default="cold",
+            help="cold - кэш очищается перед каждым запросом и замер "
+            "показывает саму страницу, warm - запросы попадают в кэш "
+            "страниц и карточек",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        with tempfile.TemporaryDirectory() as generated:
+            data = options["data"]
+            if not data:
+                data = generated
+                call_command(
+                    "generate_data",
+                    output=data,
+                    seed=options["seed"],
+                    stdout=self.stdout,
+                )
+            with benchmark_database():
+                call_command("import_data", data, stdout=self.stdout)
+                result = self.run(options)
+        with open(options["output"], "w") as file:
+            json.dump(result, file, indent=2)
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+        self.report(result, baseline)
+        self.stdout.write("Результат записан в %s" % options["output"])
+
+    def run(self, options):
+        self.posts = list(Post.objects.values_list("pk", flat=True))
+        self.groups = list(Group.objects.values_list("pk", "slug"))
+        # Профили открывают у популярных авторов, ленту - у читателей
+        self.authors = list(
+            User.objects.order_by("-stats__followers_count").values_list(
+                "username", flat=True
+            )[:1000]
+        )
+        self.readers = list(
+            User.objects.filter(
+                pk__in=Follow.objects.values("user")
+            ).values_list("pk", flat=True)[:1000]
+        ) or list(User.objects.values_list("pk", flat=True)[:1000])
+        self.users = User.objects.in_bulk(self.readers)
+        # Кэш свой у benchmark_database, рабочий не трогается
+        cold = options["cache"] == "cold"
+        cache.clear()
+        views = {}
+        for name in options["views"] or VIEWS:
+            # request_<view>(client) готовит запрос и возвращает функцию,
+            # которая его отправляет
+            request = getattr(self, "request_" + name)
+            for _ in range(options["warmup"]):
+                request(Client())()
+            samples, queries, statuses = [], [], {}
+            for _ in range(options["requests"]):
+                # Вход, выбор страницы и очистка кэша не входят в замер
+                send = request(Client())
+                if cold:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    with stopwatch(samples):
+                        response = send()
+                queries.append(len(captured))
+                status = str(response.status_code)
+                statuses[status] = statuses.get(status, 0) + 1
+            views[name] = dict(
+                summarize(samples),
+                queries_p50=statistics.median(queries),
+                queries_max=max(queries),
+                status=statuses,
+            )
+        return {
+            "started": datetime.datetime.now().isoformat(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "dataset": {
+                "users": User.objects.count(),
+                "groups": len(self.groups),
+                "posts": len(self.posts),
+                "comments": Comment.objects.count(),
+                "follows": Follow.objects.count(),
+            },
+            "requests": options["requests"],
+            "cache": options["cache"],
+            "views": views,
+        }
+
+    def login(self, client):
+        client.force_login(self.users[self.random.choice(self.readers)])
+
+    def request_index(self, client):
+        url = reverse("posts:index")
+        return lambda: client.get(url)
+
+    def request_group_list(self, client):
+        group_id, slug = self.random.choice(self.groups)
+        url = reverse("posts:list", args=(slug,))
+        return lambda: client.get(url)
+
+    def request_profile(self, client):
+        username = self.random.choice(self.authors)
+        url = reverse("posts:profile", args=(username,))
+        return lambda: client.get(url)
+
+    def request_post_detail(self, client):
+        post_id = self.random.choice(self.posts)
+        url = reverse("posts:post_detail", args=(post_id,))
+        return lambda: client.get(url)
+
+    def request_follow_index(self, client):
+        self.login(client)
+        url = reverse("posts:follow_index")
+        return lambda: client.get(url)
+
+    def request_post_create(self, client):
+        self.login(client)
+        url = reverse("posts:post_create")
+        data = {"text": "Пост из бенчмарка"}
+        if self.groups and self.random.random() < 0.5:
+            data["group"], slug = self.random.choice(self.groups)
+        return lambda: client.post(url, data)
+
+    def request_add_comment(self, client):
+        self.login(client)
+        post_id = self.random.choice(self.posts)
+        url = reverse("posts:add_comment", args=(post_id,))
+        data = {"text": "Комментарий из бенчмарка"}
+        return lambda: client.post(url, data)
+
+    def report(self, result, baseline):
+        self.stdout.write("Кэш: %s" % result["cache"])
+        if baseline and baseline.get("cache", "warm") != result["cache"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Базовый запуск сделан с кэшем %s, сравнение неточное"
+                    % baseline.get("cache", "warm")
+                )
+            )
+        self.stdout.write(
+            "view          p50 ms  p95 ms  p99 ms  queries  "
+            + ("p95 vs baseline" if baseline else "")
+        )
+        for name, view in result["views"].items():
+            line = "%-12s  %6.2f  %6.2f  %6.2f  %7s" % (
+                name,
+                view["p50"],
+                view["p95"],
+                view["p99"],
+                "%g/%d" % (view["queries_p50"], view["queries_max"]),
+            )
+            previous = baseline and baseline["views"].get(name)
+            if previous:
+                line += "  %+.0f%%" % (
+                    (view["p95"] / previous["p95"] - 1) * 100
+                )
+            self.stdout.write(line)
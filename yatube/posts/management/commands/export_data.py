@@ -0,0 +1,151 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts.models import Comment, Follow, Group, Post, User
+
+MODELS = {
+    "users": User,
+    "groups": Group,
+    "posts": Post,
+    "comments": Comment,
+    "follows": Follow,
+}
+# Пароли, email и права в выгрузку не попадают
+FIELDS = {
+    "users": (
+        "id",
+        "username",
+        "first_name",
+        "last_name",
+        "date_joined",
+        "is_active",
+    ),
+}
+# По этим полям работает --since; пользователей, группы и подписки
+# догоняет только водяной знак по id из --state
+TIMESTAMP_FIELDS = {"posts": "updated", "comments": "created"}
+
+
+def parse_since(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError("Не понимаю дату в --since: %s" % value)
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def open_output(path, compress):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает пользователей, группы, посты, комментарии и подписки "
+        "в JSONL или CSV, по файлу на модель. Строки читаются курсором "
+        "пачками, память не растет с размером таблиц. С --state "
+        "выгружает только строки новее прошлого запуска, с --since - "
+        "измененные после даты."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            help="Что выгружать: %s; по умолчанию все" % ", ".join(MODELS),
+        )
+        parser.add_argument("--output", default="export")
+        parser.add_argument(
+            "--format", choices=("jsonl", "csv"), default="jsonl"
+        )
+        parser.add_argument(
+            "--gzip", action="store_true", help="Сжимать файлы gzip"
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--since",
+            help="Только посты, измененные, и комментарии, созданные "
+            "не раньше этого времени (ISO 8601)",
+        )
+        parser.add_argument(
+            "--state",
+            help="JSON с последним выгруженным id каждой модели: "
+            "читается перед выгрузкой и обновляется после нее",
+        )
+
+    def handle(self, *args, **options):
+        names = options["models"] or list(MODELS)
+        unknown = set(names) - set(MODELS)
+        if unknown:
+            raise CommandError("Неизвестные модели: %s" % ", ".join(unknown))
+        since = options["since"] and parse_since(options["since"])
+        state = self.load(options["state"]) if options["state"] else {}
+        os.makedirs(options["output"], exist_ok=True)
+        for name in names:
+            queryset = MODELS[name].objects.order_by("pk")
+            if name in state:
+                queryset = queryset.filter(pk__gt=state[name])
+            if since and name in TIMESTAMP_FIELDS:
+                queryset = queryset.filter(
+                    **{TIMESTAMP_FIELDS[name] + "__gte": since}
+                )
+            path = os.path.join(
+                options["output"],
+                "%s.%s%s"
+                % (name, options["format"], ".gz" if options["gzip"] else ""),
+            )
+            fields = FIELDS.get(name) or [
+                field.attname for field in queryset.model._meta.fields
+            ]
+            count, last_id = self.export(queryset, fields, path, options)
+            if last_id is not None:
+                state[name] = last_id
+            self.stdout.write("%s: %d строк -> %s" % (name, count, path))
+        if options["state"]:
+            # Водяной знак двигается, только когда все файлы записаны
+            with open(options["state"], "w") as file:
+                json.dump(state, file)
+
+    def export(self, queryset, fields, path, options):
+        pk_index = fields.index(queryset.model._meta.pk.attname)
+        rows = queryset.values_list(*fields).iterator(
+            chunk_size=options["chunk_size"]
+        )
+        count, last_id = 0, None
+        with open_output(path, options["gzip"]) as file:
+            if options["format"] == "csv":
+                writer = csv.writer(file)
+                writer.writerow(fields)
+                write = writer.writerow
+            else:
+                encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+                def write(row):
+                    file.write(encoder.encode(dict(zip(fields, row))))
+                    file.write("\n")
+
+            for row in rows:
+                write(row)
+                count += 1
+                last_id = row[pk_index]
+        return count, last_id
+
+    def load(self, path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
@@ -0,0 +1,150 @@
+import os
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts import thumbnails
+from posts.models import Post
+
+# Миниатюры sorl лежат как cache/ab/cd/abcd...(md5).jpg; все остальное
+# в папке кэша (например, чекпоинт warm_thumbnails) не трогаем
+THUMBNAIL_NAME = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}\.\w+$")
+
+
+def walk(storage, directory):
+    """Имена файлов в папке хранилища относительно его корня."""
+    root = storage.path(directory)
+    for path, dirs, files in os.walk(root):
+        for file_name in files:
+            full_path = os.path.join(path, file_name)
+            name = os.path.relpath(full_path, storage.location)
+            yield name.replace(os.sep, "/"), full_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет картинки постов и миниатюры, на которые больше ничего "
+        "не ссылается: живые ссылки собираются из Post.image и kvstore "
+        "sorl, остальные файлы удаляются пачками с ограничением скорости."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать, что и сколько будет удалено",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=200,
+            help="Не больше стольких удалений в секунду, 0 - без ограничения",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="Файлы моложе стольких секунд не трогать: пост с новой "
+            "картинкой или запись в kvstore могут быть еще не сохранены",
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options["dry_run"]
+        self.verbosity = options["verbosity"]
+        self.batch_size = options["batch_size"]
+        self.rate = options["rate"]
+        self.deadline = time.time() - options["min_age"]
+        self.removed = self.reclaimed = 0
+        self.started = time.perf_counter()
+
+        images, live_thumbnails = self.mark()
+        self.stdout.write(
+            "Живых картинок: %d, миниатюр: %d"
+            % (len(images), len(live_thumbnails))
+        )
+        field = Post._meta.get_field("image")
+        self.sweep(
+            (name, path)
+            for name, path in walk(field.storage, field.upload_to)
+            if name not in images
+        )
+        prefix = sorl_settings.THUMBNAIL_PREFIX
+        self.sweep(
+            (name, path)
+            for name, path in walk(default.storage, prefix)
+            if THUMBNAIL_NAME.match(name[len(prefix):])
+            and name not in live_thumbnails
+        )
+        if not self.dry_run:
+            # Убираем из kvstore записи об удаленных файлах
+            default.kvstore.cleanup()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "%s файлов: %d, освобождено %.1f МБ"
+                % (
+                    "Будет удалено" if self.dry_run else "Удалено",
+                    self.removed,
+                    self.reclaimed / 1024 / 1024,
+                )
+            )
+        )
+
+    def mark(self):
+        images = set(
+            Post.objects.exclude(image="")
+            .values_list("image", flat=True)
+            .distinct()
+            .iterator()
+        )
+        live_thumbnails = set()
+        for name in images:
+            live_thumbnails.update(thumbnails.stored(name))
+        return images, live_thumbnails
+
+    def sweep(self, garbage):
+        batch = []
+        for name, path in garbage:
+            try:
+                if os.path.getmtime(path) > self.deadline:
+                    continue
+            except FileNotFoundError:
+                continue
+            batch.append((name, path))
+            if len(batch) >= self.batch_size:
+                self.remove(batch)
+                batch = []
+        if batch:
+            self.remove(batch)
+
+    def remove(self, batch):
+        # Ссылки собраны в начале прохода, а с ограничением скорости он
+        # идет долго: за это время файл мог снова понадобиться посту
+        referenced = set(
+            Post.objects.filter(
+                image__in=[name for name, path in batch]
+            ).values_list("image", flat=True)
+        )
+        for name, path in batch:
+            if name in referenced:
+                continue
+            try:
+                size = os.path.getsize(path)
+                if not self.dry_run:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+            if self.dry_run or self.verbosity > 1:
+                self.stdout.write(name)
+            self.removed += 1
+            self.reclaimed += size
+        if self.rate and not self.dry_run:
+            # Диск нужен и сайту: держим среднюю скорость не выше --rate
+            ahead = self.removed / self.rate - (
+                time.perf_counter() - self.started
+            )
+            if ahead > 0:
+                time.sleep(ahead)
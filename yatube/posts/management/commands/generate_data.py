@@ -0,0 +1,201 @@
+import datetime
+import gzip
+import itertools
+import os
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from faker import Faker
+
+# Тексты берутся из заранее сгенерированного набора: Faker тратит
+# десятки микросекунд на текст, на миллионах постов это минуты
+TEXT_POOL = 5000
+
+
+def zipf_weights(count, alpha):
+    """Накопленные веса 1/rank^alpha для random.choices(cum_weights=)."""
+    return list(
+        itertools.accumulate(1 / rank ** alpha for rank in range(1, count + 1))
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует синтетические данные в формате export_data: "
+        "пользователи, группы, посты, ветки комментариев и подписки со "
+        "степенным распределением популярности авторов. Файлы пишутся "
+        "потоком и загружаются командой import_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default="synthetic")
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument(
+            "--comments",
+            type=float,
+            default=2,
+            help="Среднее число комментариев на пост",
+        )
+        parser.add_argument(
+            "--follows",
+            type=float,
+            default=10,
+            help="Среднее число подписок на пользователя",
+        )
+        parser.add_argument(
+            "--alpha",
+            type=float,
+            default=1.1,
+            help="Показатель степенного закона популярности авторов",
+        )
+        parser.add_argument(
+            "--reply-rate",
+            type=float,
+            default=0.4,
+            help="Доля комментариев, которые отвечают на другой",
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="За сколько дней посты"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--gzip", action="store_true")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options["seed"])
+        self.fake = Faker("ru_RU")
+        self.fake.seed_instance(options["seed"])
+        self.texts = [
+            self.fake.text(max_nb_chars=200) for _ in range(TEXT_POOL)
+        ]
+        # Ранг популярности пользователя - его номер: первые авторы
+        # собирают большую часть подписок и пишут больше постов
+        self.popularity = zipf_weights(options["users"], options["alpha"])
+        self.user_ids = range(1, options["users"] + 1)
+        self.now = timezone.now()
+        os.makedirs(options["output"], exist_ok=True)
+        for name in ("users", "groups", "posts", "comments", "follows"):
+            count = self.write(name, getattr(self, name)())
+            self.stdout.write("%s: %d" % (name, count))
+
+    def write(self, name, rows):
+        path = os.path.join(
+            self.options["output"],
+            name + (".jsonl.gz" if self.options["gzip"] else ".jsonl"),
+        )
+        opener = gzip.open if self.options["gzip"] else open
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        count = 0
+        with opener(path, "wt", encoding="utf-8") as file:
+            for row in rows:
+                file.write(encoder.encode(row))
+                file.write("\n")
+                count += 1
+        return count
+
+    def authors(self, count):
+        return self.random.choices(
+            self.user_ids, cum_weights=self.popularity, k=count
+        )
+
+    def users(self):
+        joined = self.now - datetime.timedelta(days=self.options["days"] + 1)
+        for user_id in self.user_ids:
+            # Номер в имени: Faker повторяет имена уже на тысячах
+            yield {
+                "id": user_id,
+                "username": "%s%d" % (self.fake.user_name(), user_id),
+                "first_name": self.fake.first_name(),
+                "last_name": self.fake.last_name(),
+                "date_joined": joined,
+            }
+
+    def groups(self):
+        for group_id in range(1, self.options["groups"] + 1):
+            yield {
+                "id": group_id,
+                "title": self.fake.sentence(nb_words=3).rstrip("."),
+                "slug": "group-%d" % group_id,
+                "description": self.fake.sentence(),
+            }
+
+    def posts(self):
+        total = self.options["posts"]
+        start = self.now - datetime.timedelta(days=self.options["days"])
+        step = (self.now - start) / max(total, 1)
+        batch = 10000
+        for first in range(1, total + 1, batch):
+            size = min(batch, total + 1 - first)
+            for offset, author_id in enumerate(self.authors(size)):
+                post_id = first + offset
+                pub_date = start + step * post_id
+                group_id = None
+                if self.options["groups"] and self.random.random() < 0.5:
+                    group_id = self.random.randint(1, self.options["groups"])
+                yield {
+                    "id": post_id,
+                    "author_id": author_id,
+                    "group_id": group_id,
+                    "text": self.random.choice(self.texts),
+                    "pub_date": pub_date,
+                    "updated": pub_date,
+                }
+
+    def comments(self):
+        total = self.options["posts"]
+        start = self.now - datetime.timedelta(days=self.options["days"])
+        step = (self.now - start) / max(total, 1)
+        max_depth = settings.COMMENT_MAX_DEPTH
+        reply_rate = self.options["reply_rate"]
+        comment_id = 0
+        for post_id in range(1, total + 1):
+            count = int(self.random.expovariate(1 / self.options["comments"]))
+            if not count:
+                continue
+            created = start + step * post_id
+            # Глубина комментариев только этого поста: ответ выбирает
+            # родителя среди уже написанных к нему
+            thread = []
+            for _ in range(count):
+                comment_id += 1
+                created += datetime.timedelta(
+                    minutes=self.random.randint(1, 60)
+                )
+                parent_id, depth = None, 0
+                candidates = [
+                    (pk, level) for pk, level in thread if level < max_depth
+                ]
+                if candidates and self.random.random() < reply_rate:
+                    parent_id, depth = self.random.choice(candidates)
+                    depth += 1
+                thread.append((comment_id, depth))
+                yield {
+                    "id": comment_id,
+                    "post_id": post_id,
+                    "author_id": self.random.choice(self.user_ids),
+                    "parent_id": parent_id,
+                    "text": self.fake.sentence(),
+                    "created": created,
+                }
+
+    def follows(self):
+        follow_id = 0
+        users = len(self.user_ids)
+        for user_id in self.user_ids:
+            # Число подписок тоже с тяжелым хвостом, но не больше,
+            # чем есть авторов
+            wanted = self.random.paretovariate(2) * self.options["follows"]
+            wanted = min(int(wanted / 2), users - 1)
+            authors = set(self.authors(wanted)) - {user_id}
+            for author_id in sorted(authors):
+                follow_id += 1
+                yield {
+                    "id": follow_id,
+                    "user_id": user_id,
+                    "author_id": author_id,
+                }
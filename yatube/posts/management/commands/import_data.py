@@ -0,0 +1,294 @@
+import gzip
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from posts import cache, counters, feed, search, threads
+from posts.models import Comment, Follow, Group, Post, User
+
+# Порядок важен: каждая модель ссылается только на загруженные раньше
+ORDER = ("users", "groups", "posts", "comments", "follows")
+
+
+def open_input(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def keep_timestamps():
+    """Сохранять даты из файла, а не ставить текущее время.
+
+    bulk_create тоже вызывает pre_save, и auto_now_add перетер бы
+    pub_date и created моментом загрузки.
+    """
+    fields = [
+        Post._meta.get_field("pub_date"),
+        Post._meta.get_field("updated"),
+        Comment._meta.get_field("created"),
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает пользователей, группы, посты, комментарии и подписки "
+        "из JSONL (формат export_data) пачками через bulk_create. Счетчики, "
+        "пути комментариев, поисковый индекс и ленты пересчитываются "
+        "один раз в конце."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "input",
+            help="Папка с users.jsonl, groups.jsonl, posts.jsonl, "
+            "comments.jsonl, follows.jsonl (можно .jsonl.gz)",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        # Пользователи и группы сопоставляются по username и slug, в
+        # памяти только их id. Посты и комментарии получают id со
+        # сдвигом за максимальный в таблице, и ссылки на них
+        # пересчитываются без словарей; множества исходных id нужны,
+        # чтобы не сослаться на пропущенную строку
+        self.users, self.groups = {}, {}
+        self.posts, self.comments = set(), set()
+        self.post_offset = self.max_id(Post)
+        self.comment_offset = self.max_id(Comment)
+        self.follow_offset = self.max_id(Follow)
+        paths = self.find(options["input"])
+        with search.deferred(), keep_timestamps():
+            for name, path in paths:
+                self.load(name, path)
+            self.stage("counters", counters.rebuild)
+            self.stage(
+                "comment paths",
+                lambda: threads.fill_paths(
+                    Comment.objects.filter(pk__gt=self.comment_offset),
+                    self.batch_size,
+                ),
+            )
+            self.reset_sequences()
+        self.backfill_feeds()
+        cache.bump(
+            "all",
+            *["group:%s" % pk for pk in self.groups.values()],
+            *["author:%s" % pk for pk in self.users.values()],
+        )
+        self.stdout.write(self.style.SUCCESS("Загрузка завершена"))
+
+    def find(self, directory):
+        paths = []
+        for name in ORDER:
+            for extension in (".jsonl", ".jsonl.gz"):
+                path = os.path.join(directory, name + extension)
+                if os.path.exists(path):
+                    paths.append((name, path))
+                    break
+        if not paths:
+            raise CommandError("В %s нет файлов для загрузки" % directory)
+        return paths
+
+    def load(self, name, path):
+        load_chunk = getattr(self, "load_" + name)
+        loaded = skipped = 0
+        started = time.perf_counter()
+        with open_input(path) as file:
+            rows = (json.loads(line) for line in file if line.strip())
+            for chunk in chunks(rows, self.batch_size):
+                # bulk_create пишет каждую пачку в своей транзакции
+                done = load_chunk(chunk)
+                loaded += done
+                skipped += len(chunk) - done
+        self.report(name, loaded, started, skipped)
+
+    def stage(self, name, action):
+        started = time.perf_counter()
+        action()
+        self.stdout.write(
+            "%s: %.1f с" % (name, time.perf_counter() - started)
+        )
+
+    def report(self, name, loaded, started, skipped):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            "%s: %d строк за %.1f с, %.0f строк/с%s"
+            % (
+                name,
+                loaded,
+                elapsed,
+                loaded / elapsed if elapsed else 0,
+                ", пропущено %d" % skipped if skipped else "",
+            )
+        )
+
+    def load_users(self, rows):
+        by_name = {row["username"]: row for row in rows}
+        existing = set(
+            User.objects.filter(username__in=by_name).values_list(
+                "username", flat=True
+            )
+        )
+        User.objects.bulk_create(
+            User(
+                username=username,
+                first_name=row.get("first_name", ""),
+                last_name=row.get("last_name", ""),
+                email=row.get("email", ""),
+                password=row.get("password") or make_password(None),
+                **{
+                    field: row[field]
+                    for field in ("date_joined", "is_active")
+                    if field in row
+                }
+            )
+            for username, row in by_name.items()
+            if username not in existing
+        )
+        # На SQLite bulk_create не возвращает id: дочитываем их
+        for username, pk in User.objects.filter(
+            username__in=by_name
+        ).values_list("username", "pk"):
+            self.users[by_name[username]["id"]] = pk
+        return len(by_name) - len(existing)
+
+    def load_groups(self, rows):
+        by_slug = {row["slug"]: row for row in rows}
+        existing = set(
+            Group.objects.filter(slug__in=by_slug).values_list(
+                "slug", flat=True
+            )
+        )
+        Group.objects.bulk_create(
+            Group(
+                slug=slug,
+                title=row["title"],
+                description=row.get("description", ""),
+            )
+            for slug, row in by_slug.items()
+            if slug not in existing
+        )
+        for slug, pk in Group.objects.filter(slug__in=by_slug).values_list(
+            "slug", "pk"
+        ):
+            self.groups[by_slug[slug]["id"]] = pk
+        return len(by_slug) - len(existing)
+
+    def load_posts(self, rows):
+        posts = [
+            Post(
+                id=self.post_offset + row["id"],
+                author_id=self.users[row["author_id"]],
+                group_id=self.groups.get(row.get("group_id")),
+                text=row["text"],
+                pub_date=row["pub_date"],
+                updated=row.get("updated") or row["pub_date"],
+                image=row.get("image", ""),
+                image_width=row.get("image_width"),
+                image_height=row.get("image_height"),
+            )
+            for row in rows
+            if row["author_id"] in self.users
+        ]
+        Post.objects.bulk_create(posts)
+        self.posts.update(post.id - self.post_offset for post in posts)
+        return len(posts)
+
+    def load_comments(self, rows):
+        comments = []
+        for row in rows:
+            # Комментарии к незагруженным постам и ответы на пропущенные
+            # комментарии не грузятся, как при каскадном удалении.
+            # Родитель идет в файле раньше ответа, в том числе в пачке
+            parent_id = row.get("parent_id")
+            if (
+                row["author_id"] not in self.users
+                or row["post_id"] not in self.posts
+                or (parent_id and parent_id not in self.comments)
+            ):
+                continue
+            self.comments.add(row["id"])
+            comments.append(
+                Comment(
+                    id=self.comment_offset + row["id"],
+                    post_id=self.post_offset + row["post_id"],
+                    author_id=self.users[row["author_id"]],
+                    parent_id=(
+                        self.comment_offset + parent_id if parent_id else None
+                    ),
+                    text=row["text"],
+                    created=row["created"],
+                )
+            )
+        Comment.objects.bulk_create(comments)
+        return len(comments)
+
+    def load_follows(self, rows):
+        follows = [
+            Follow(
+                user_id=self.users[row["user_id"]],
+                author_id=self.users[row["author_id"]],
+            )
+            for row in rows
+            if row["user_id"] in self.users
+            and row["author_id"] in self.users
+            and row["user_id"] != row["author_id"]
+        ]
+        # Уже существующие подписки пропускает unique_follow
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        return len(follows)
+
+    def backfill_feeds(self):
+        started = time.perf_counter()
+        authors = (
+            Follow.objects.filter(pk__gt=self.follow_offset)
+            .order_by("author_id")
+            .values_list("author_id", flat=True)
+            .distinct()
+        )
+        filled = 0
+        # Одна вставка на пачку авторов; пачка меньше лимита параметров
+        # SQLite (999)
+        for chunk in chunks(authors.iterator(), 500):
+            with transaction.atomic():
+                filled += feed.backfill_followers(chunk, self.follow_offset)
+        self.report("feeds", filled, started, 0)
+
+    def reset_sequences(self):
+        # Посты и комментарии вставлены с явными id: счетчики
+        # автоинкремента в PostgreSQL надо подвинуть за них
+        sql = connection.ops.sequence_reset_sql(no_style(), [Post, Comment])
+        if sql:
+            with connection.cursor() as cursor:
+                for statement in sql:
+                    cursor.execute(statement)
+
+    def max_id(self, model):
+        return model.objects.aggregate(last=Max("pk"))["last"] or 0
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счетчики постов, комментариев и подписок "
+        "по данным в таблицах."
+    )
+
+    def handle(self, *args, **options):
+        counters.rebuild()
+        self.stdout.write(self.style.SUCCESS("Счетчики пересчитаны"))
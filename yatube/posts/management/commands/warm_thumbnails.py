@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import warm
+
+CHECKPOINT_EVERY = 100
+
+
+def warm_image(image_name, sizes, force):
+    try:
+        return warm(image_name, sizes, force), None
+    except Exception as error:
+        return 0, "%s: %s" % (image_name, error)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Создает миниатюры всех размеров из POST_THUMBNAIL_SIZES для "
+        "картинок постов в нескольких процессах. Готовые пропускает, "
+        "после прерывания продолжает с последнего обработанного поста."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1
+        )
+        parser.add_argument(
+            "--size",
+            action="append",
+            dest="sizes",
+            help="Размер вместо POST_THUMBNAIL_SIZES, можно несколько",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересоздать и уже готовые миниатюры",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Начать с первого поста, а не с сохраненного места",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=os.path.join(
+                settings.MEDIA_ROOT, "cache", "warm_thumbnails.checkpoint"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        sizes = options["sizes"] or list(
+            settings.POST_THUMBNAIL_SIZES.values()
+        )
+        checkpoint = options["checkpoint"]
+        start_after = 0 if options["restart"] else self.load(checkpoint)
+        posts = (
+            Post.objects.exclude(image="")
+            .filter(pk__gt=start_after)
+            .order_by("pk")
+            .values_list("pk", "image")
+        )
+        rows = list(posts.iterator())
+        if start_after:
+            self.stdout.write("Продолжаем после поста %s" % start_after)
+        # Процессы наследуют открытые соединения с БД, их нельзя делить
+        connections.close_all()
+        started = time.perf_counter()
+        made = failed = 0
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(
+            options["workers"], mp_context=context
+        ) as executor:
+            results = executor.map(
+                warm_image,
+                [image for pk, image in rows],
+                [sizes] * len(rows),
+                [options["force"]] * len(rows),
+                chunksize=8,
+            )
+            # map отдает результаты по порядку, поэтому все посты до
+            # сохраненного id уже обработаны
+            for done, ((pk, image), (count, error)) in enumerate(
+                zip(rows, results), 1
+            ):
+                made += count
+                if error:
+                    failed += 1
+                    self.stderr.write(error)
+                if done % CHECKPOINT_EVERY == 0:
+                    self.save(checkpoint, pk)
+                    self.report(done, len(rows), made, started)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.report(len(rows), len(rows), made, started)
+        if failed:
+            self.stderr.write("Ошибок: %d" % failed)
+
+    def report(self, done, total, made, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            "%d/%d картинок, создано миниатюр: %d, %.1f картинок/с"
+            % (done, total, made, done / elapsed if elapsed else 0)
+        )
+
+    def load(self, checkpoint):
+        try:
+            with open(checkpoint) as file:
+                return int(file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def save(self, checkpoint, pk):
+        os.makedirs(os.path.dirname(checkpoint), exist_ok=True)
+        with open(checkpoint + ".tmp", "w") as file:
+            file.write(str(pk))
+        os.replace(checkpoint + ".tmp", checkpoint)
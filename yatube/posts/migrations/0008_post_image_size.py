@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:28
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from PIL import Image
+
+
+def fill_image_size(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    for post in Post.objects.exclude(image='').only('image').iterator():
+        # Читается только заголовок файла, пиксели не декодируются
+        try:
+            with default_storage.open(post.image.name) as file:
+                width, height = Image.open(file).size
+        except Exception:
+            continue
+        Post.objects.filter(pk=post.pk).update(
+            image_width=width, image_height=height
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='image height'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='image width'),
+        ),
+        migrations.RunPython(fill_image_size, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,16 @@
 from django.db import models
 from django.contrib.auth import get_user_model
-from core.models import CreatedModel
+from core.models import AtomicSaveMixin, CreatedModel
 from django.db.models import UniqueConstraint
 
+from .storage import image_storage
+
 
 User = get_user_model()
 
+# Ширина звена пути комментария: id, дополненный нулями, см. posts.threads
+PATH_SEGMENT = 10
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -17,18 +22,25 @@ class Group(models.Model):
         unique=True, verbose_name="unique adress for group"
     )
     description = models.TextField(verbose_name="group descriptions")
+    posts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="posts in group"
+    )
 
     def __str__(self) -> str:
         return self.title
 
 
-class Post(models.Model):
+class Post(AtomicSaveMixin, models.Model):
 
     text = models.TextField(verbose_name="blog text", help_text="Текст блога")
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name="date of release",
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name="date of last change",
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -43,19 +55,48 @@ class Post(models.Model):
         verbose_name="name of group",
         help_text="Группа, к которой будет относиться пост",
     )
-    # Поле для картинки (необязательное)
-    image = models.ImageField("Картинка", upload_to="posts/", blank=True)
+    # Поле для картинки (необязательное). Одинаковые картинки хранятся
+    # одним файлом, индекс нужен, чтобы считать ссылки на него
+    image = models.ImageField(
+        "Картинка",
+        upload_to="posts/",
+        blank=True,
+        storage=image_storage,
+        db_index=True,
+    )
+    # Размеры картинки после обработки при загрузке. Не width_field:
+    # тот открывает файл при каждой загрузке поста с пустыми размерами
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name="image width"
+    )
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name="image height"
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="comments on post"
+    )
 
     class Meta:
         ordering = ["-pub_date"]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
+        # Ленты сортируются по (-pub_date, -id), см. CursorPaginator
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"], name="post_date"),
+            models.Index(
+                fields=["group", "-pub_date", "-id"], name="post_group_date"
+            ),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="post_author_date",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
 
-class Comment(CreatedModel):
+class Comment(AtomicSaveMixin, CreatedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -67,17 +108,42 @@ class Comment(CreatedModel):
         related_name="comments",
     )
     text = models.TextField()
+    parent = models.ForeignKey(
+        "self",
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="replies",
+        verbose_name="reply to",
+    )
+    # Звенья id от корня ветки до комментария. Сортировка по пути дает
+    # порядок показа, ветка целиком - один диапазон индекса
+    path = models.CharField(max_length=255, blank=True, editable=False)
 
     class Meta:
         ordering = ["-created"]
         verbose_name = "Комент"
         verbose_name_plural = "Коментарии"
+        # Ветки читаются по пути, а post.comments без order_by -
+        # по сортировке модели, от новых к старым
+        indexes = [
+            models.Index(fields=["post", "path"], name="comment_post_path"),
+            models.Index(
+                fields=["post", "-created", "-id"],
+                name="comment_post_created",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    @property
+    def depth(self):
+        """0 у комментария к посту, 1 у ответа на него и так далее."""
+        return max(len(self.path) // PATH_SEGMENT - 1, 0)
 
-class Follow(models.Model):
+
+class Follow(AtomicSaveMixin, models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="follower"
     )
@@ -86,4 +152,65 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name="following",
     )
-    UniqueConstraint(fields=["author"], name="unique_author")
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["user", "author"], name="unique_follow")
+        ]
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, которые иначе считались бы COUNT(*).
+
+    Обновляются в posts.counters при сохранении и удалении Post и
+    Follow, пересчитываются командой rebuild_counters.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="stats"
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Счетчики пользователя"
+        verbose_name_plural = "Счетчики пользователей"
+
+    def __str__(self) -> str:
+        return str(self.user)
+
+
+class FeedEntry(models.Model):
+    """Пост в ленте подписок пользователя.
+
+    Строки пишутся при публикации поста (fan-out on write), поэтому
+    лента читается одним проходом по индексу (user, pub_date).
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="feed"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="feed_entries"
+    )
+    # Копия Post.pub_date, чтобы сортировать ленту без соединения
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        # post_id, а не post: иначе Django сортирует по Post.ordering
+        # через соединение, мимо индекса feed_user_date
+        ordering = ["-pub_date", "-post_id"]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = [
+            UniqueConstraint(fields=["user", "post"], name="unique_feed_post")
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-post"], name="feed_user_date"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user} <- {self.post}"
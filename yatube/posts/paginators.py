@@ -0,0 +1,149 @@
+import base64
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(post):
+    """Непрозрачный курсор из ключа сортировки поста (pub_date, id)."""
+    raw = "%s|%s" % (post.pub_date.isoformat(), post.pk)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Ключ (pub_date, id) из курсора или None, если курсор испорчен."""
+    try:
+        padding = "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        date_part, pk_part = raw.rsplit("|", 1)
+        pub_date = parse_datetime(date_part)
+        pk = int(pk_part)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница ленты, полученная по курсору, а не по номеру.
+
+    Номера страницы и общего количества нет: ради них пришлось бы
+    считать COUNT(*) и пропускать OFFSET строк.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return "<CursorPage of %s>" % len(self)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+def seek(queryset, key, older, limit, fields=("pub_date", "id")):
+    """Строки рядом с ключом: сначала ближайшие к курсору.
+
+    older=True идет к более старым постам (?after=), False к более
+    новым (?before=). fields задает поля даты и id в queryset.
+    """
+    date_field, id_field = fields
+    pub_date, pk = key
+    lookup = "lt" if older else "gt"
+    condition = Q(**{date_field + "__" + lookup: pub_date}) | Q(
+        **{date_field: pub_date, id_field + "__" + lookup: pk}
+    )
+    prefix = "-" if older else ""
+    return list(
+        queryset.filter(condition).order_by(
+            prefix + date_field, prefix + id_field
+        )[:limit]
+    )
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор постов по ключу (pub_date, id).
+
+    Обычные страницы ?page=N работают как у Paginator, а ?after= и
+    ?before= отдают соседнюю страницу одним запросом по индексу,
+    сколько бы страниц ни было перед ней. Вместо QuerySet можно
+    передать ленту со своим методом seek(key, older, limit).
+    """
+
+    ordering = ("-pub_date", "-id")
+
+    def __init__(self, object_list, per_page, **kwargs):
+        if isinstance(object_list, QuerySet):
+            # id разводит посты с одинаковой датой,
+            # иначе курсор их потеряет
+            object_list = object_list.order_by(*self.ordering)
+        super().__init__(object_list, per_page, **kwargs)
+
+    def seek(self, key, older, limit):
+        if isinstance(self.object_list, QuerySet):
+            return seek(self.object_list, key, older, limit)
+        return self.object_list.seek(key, older, limit)
+
+    def first_page(self):
+        """Первая страница без COUNT(*) и номеров страниц.
+
+        Берется на строку больше: по ней видно, есть ли продолжение.
+        """
+        rows = list(self.object_list[: self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[: self.per_page], self, has_next, False)
+
+    def cursor_page(self, after=None, before=None):
+        key = decode_cursor(after or before or "")
+        if key is None:
+            return self.get_page(1)
+        older = bool(after)
+        rows = self.seek(key, older, self.per_page + 1)
+        if not rows:
+            # За курсором ничего нет (самый новый или самый старый пост):
+            # пустой странице не из чего строить ссылки
+            return self.get_page(1)
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if older:
+            return CursorPage(rows, self, has_more, True)
+        rows.reverse()
+        return CursorPage(rows, self, True, has_more)
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста в порядке показа веток, см. posts.threads.
+
+    Курсор - путь последнего показанного комментария: следующая
+    страница начинается сразу за ним, даже посреди ветки.
+    """
+
+    ordering = ("path",)
+
+    def cursor_page(self, after=None, before=None):
+        if not after or not after.isdigit():
+            return self.first_page()
+        rows = list(
+            self.object_list.filter(path__gt=after)[: self.per_page + 1]
+        )
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[: self.per_page], self, has_next, True)
+
+
+def get_page(request, object_list, per_page):
+    """Страница для шаблона: по курсору, если он есть в запросе."""
+    paginator = CursorPaginator(object_list, per_page)
+    after = request.GET.get("after")
+    before = request.GET.get("before")
+    if after or before:
+        return paginator.cursor_page(after=after, before=before)
+    return paginator.get_page(request.GET.get("page"))
@@ -0,0 +1,251 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection, connections
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+TABLE = "posts_post_fts"
+
+# Границы совпадения в сниппете: символы, которых нет в тексте
+# постов, чтобы экранировать текст и только потом вставить <mark>
+MARK_START = "\x02"
+MARK_END = "\x03"
+SNIPPET_TOKENS = 24
+# Лучшие совпадения первыми, при равном bm25 новые посты выше
+ORDER = "rank, rowid DESC"
+# bm25 считается для каждого совпадения. Если совпадений больше, запрос
+# состоит из самых частых слов, и релевантность почти ничего не дает:
+# такие результаты показываются от новых к старым
+RANK_LIMIT = 10000
+
+
+def match_expression(query):
+    """Запрос пользователя как выражение MATCH или None, если слов нет.
+
+    Каждое слово берется в кавычки, поэтому операторы FTS5 во вводе
+    не ломают запрос; последнее слово ищется как префикс.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = ['"%s"' % word for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def matching_ids(query):
+    """Подзапрос с id найденных постов для filter(pk__in=...)."""
+    return RawSQL(
+        "SELECT rowid FROM %s WHERE %s MATCH %%s" % (TABLE, TABLE),
+        (match_expression(query),),
+    )
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, "<mark>")
+        .replace(MARK_END, "</mark>")
+    )
+
+
+# Триггеры, которые держат индекс в согласии с posts_post
+TRIGGERS = {
+    "posts_post_fts_insert": (
+        "CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert"
+        " AFTER INSERT ON posts_post BEGIN"
+        " INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);"
+        " END"
+    ),
+    "posts_post_fts_delete": (
+        "CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete"
+        " AFTER DELETE ON posts_post BEGIN"
+        " INSERT INTO posts_post_fts(posts_post_fts, rowid, text)"
+        " VALUES ('delete', old.id, old.text);"
+        " END"
+    ),
+    "posts_post_fts_update": (
+        "CREATE TRIGGER IF NOT EXISTS posts_post_fts_update"
+        " AFTER UPDATE OF text ON posts_post BEGIN"
+        " INSERT INTO posts_post_fts(posts_post_fts, rowid, text)"
+        " VALUES ('delete', old.id, old.text);"
+        " INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);"
+        " END"
+    ),
+}
+
+
+def ensure_triggers(using="default"):
+    """Вернуть триггеры индекса, если миграция пересоздала posts_post.
+
+    SQLite не умеет большинство ALTER TABLE, и Django копирует таблицу
+    в новую, теряя триггеры. Без них индекс тихо отстает от постов,
+    поэтому после каждой миграции триггеры проверяются, и при потере
+    индекс пересобирается.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+            " AND name = %s",
+            [TABLE],
+        )
+        if cursor.fetchone() is None:
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            " AND tbl_name = 'posts_post'"
+        )
+        present = {name for (name,) in cursor.fetchall()}
+        if present >= set(TRIGGERS):
+            return
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+    rebuild(using)
+
+
+@contextmanager
+def deferred(using="default"):
+    """Не обновлять индекс на каждую вставку, а пересобрать в конце.
+
+    Для массовой загрузки: триггеры снимаются, а на выходе
+    ensure_triggers ставит их обратно и пересобирает индекс целиком.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        yield
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute("DROP TRIGGER IF EXISTS %s" % name)
+    try:
+        yield
+    finally:
+        ensure_triggers(using)
+
+
+def rebuild(using="default"):
+    """Пересобрать индекс по posts_post и сжать его."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO %s(%s) VALUES ('rebuild')" % (TABLE, TABLE)
+        )
+        cursor.execute(
+            "INSERT INTO %s(%s) VALUES ('optimize')" % (TABLE, TABLE)
+        )
+
+
+class SearchResults:
+    """Найденные посты по убыванию релевантности для CursorPaginator.
+
+    Курсор остается обычным (pub_date, id): по id поста из курсора
+    заново считается его bm25, и следующая страница ищется по ключу
+    (rank, id), так что сортировка по релевантности не требует
+    OFFSET. Слишком широкие запросы сортируются по id. У каждого поста
+    есть snippet с выделенными совпадениями.
+    """
+
+    def __init__(self, query):
+        self.match = match_expression(query)
+
+    @cached_property
+    def ranked(self):
+        """Сортировать ли по bm25: совпадений не больше RANK_LIMIT."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM ("
+                " SELECT rowid FROM %s WHERE %s MATCH %%s LIMIT %%s"
+                ")" % (TABLE, TABLE),
+                [self.match, RANK_LIMIT + 1],
+            )
+            return cursor.fetchone()[0] <= RANK_LIMIT
+
+    def _posts(self, condition, params, order, limit, offset=0):
+        # Сниппеты строятся только для постов страницы: во внутреннем
+        # запросе их пришлось бы считать для всех совпадений до LIMIT
+        sql = (
+            "SELECT rowid, snippet(%(table)s, 0, '%(start)s', '%(end)s',"
+            " '…', %(tokens)d) FROM %(table)s"
+            " WHERE %(table)s MATCH %%s AND rowid IN ("
+            " SELECT rowid FROM %(table)s WHERE %(table)s MATCH %%s"
+            " %(condition)s ORDER BY %(order)s LIMIT %%s OFFSET %%s"
+            ") ORDER BY %(order)s"
+            % {
+                "table": TABLE,
+                "start": MARK_START,
+                "end": MARK_END,
+                "tokens": SNIPPET_TOKENS,
+                "condition": condition,
+                "order": order,
+            }
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql, [self.match, self.match, *params, limit, offset]
+            )
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related("author", "group").in_bulk(
+            [pk for pk, snippet in rows]
+        )
+        found = []
+        for pk, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                found.append(post)
+        return found
+
+    def count(self):
+        if self.match is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM %s WHERE %s MATCH %%s" % (TABLE, TABLE),
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, index):
+        if self.match is None:
+            return []
+        order = ORDER if self.ranked else "rowid DESC"
+        return self._posts(
+            "", [], order, index.stop - index.start, index.start
+        )
+
+    def _rank(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT rank FROM %s WHERE %s MATCH %%s AND rowid = %%s"
+                % (TABLE, TABLE),
+                [self.match, pk],
+            )
+            row = cursor.fetchone()
+        return None if row is None else row[0]
+
+    def seek(self, key, older, limit):
+        if self.match is None:
+            return []
+        pk = key[1]
+        if not self.ranked:
+            if older:
+                return self._posts("AND rowid < %s", [pk], "rowid DESC", limit)
+            return self._posts("AND rowid > %s", [pk], "rowid", limit)
+        rank = self._rank(pk)
+        if rank is None:
+            # Пост из курсора изменился и больше не подходит
+            return self[0:limit] if older else []
+        if older:
+            condition = "AND (rank > %s OR (rank = %s AND rowid < %s))"
+            order = ORDER
+        else:
+            condition = "AND (rank < %s OR (rank = %s AND rowid > %s))"
+            order = "rank DESC, rowid"
+        return self._posts(condition, [rank, rank, pk], order, limit)
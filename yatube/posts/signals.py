@@ -0,0 +1,147 @@
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.instrumentation import count_cache
+
+from . import cache, counters, feed, images, search, threads, thumbnails
+from .fragments import post_cards_rendered
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_group(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = ""
+    if instance.pk and not raw:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list("group_id", "image")
+            .first()
+        ) or (None, "")
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    counters.post_saved(instance, created, instance._previous_group_id)
+    if created:
+        feed.fan_out(instance)
+    cache.bump(*cache.post_scopes(instance, instance._previous_group_id))
+    previous_image = instance._previous_image
+    if previous_image and previous_image != instance.image.name:
+        transaction.on_commit(lambda: images.release(previous_image))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.post_deleted(instance)
+    cache.bump(*cache.post_scopes(instance))
+    if instance.image:
+        # Файл удаляется после коммита: при откате пост останется
+        name = instance.image.name
+        transaction.on_commit(lambda: images.release(name))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        threads.assign_path(instance)
+        counters.comment_changed(instance, 1)
+        cache.bump("post:%s" % instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.comment_changed(instance, -1)
+    cache.bump("post:%s" % instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Счетчики раньше ленты: по followers_count видно знаменитость
+        counters.follow_changed(instance, 1)
+        feed.backfill(instance.user_id, instance.author_id)
+        cache.bump(
+            "author:%s" % instance.author_id, "author:%s" % instance.user_id
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.follow_changed(instance, -1)
+    feed.purge(instance.user_id, instance.author_id)
+    cache.bump(
+        "author:%s" % instance.author_id, "author:%s" % instance.user_id
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    # Название группы выводится в карточках постов на всех лентах, в том
+    # числе в профилях авторов, писавших в группу
+    if raw:
+        return
+    author_ids = (
+        Post.objects.filter(group=instance)
+        .values_list("author_id", flat=True)
+        .distinct()
+    )
+    cache.bump(
+        "all",
+        "group:%s" % instance.pk,
+        "card.group:%s" % instance.pk,
+        *["author:%s" % author_id for author_id in author_ids],
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    # Имя автора есть в карточках всех его постов и под его
+    # комментариями. Вход пользователя сохраняет только last_login и
+    # страниц не касается
+    update_fields = kwargs.get("update_fields")
+    if created or raw or update_fields == {"last_login"}:
+        return
+    group_ids = (
+        Post.objects.filter(author=instance, group__isnull=False)
+        .values_list("group_id", flat=True)
+        .distinct()
+    )
+    commented_ids = (
+        Comment.objects.filter(author=instance)
+        .values_list("post_id", flat=True)
+        .distinct()
+    )
+    cache.bump(
+        "all",
+        "author:%s" % instance.pk,
+        "card.author:%s" % instance.pk,
+        *["group:%s" % group_id for group_id in group_ids],
+        *["post:%s" % post_id for post_id in commented_ids],
+    )
+
+
+@receiver(post_cards_rendered)
+def post_cards_cache_stats(sender, hits, misses, **kwargs):
+    count_cache(hits, misses)
+
+
+@receiver(request_finished)
+def request_thumbnails_done(sender, **kwargs):
+    thumbnails.wait_pending()
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.name == "posts":
+        search.ensure_triggers(using)
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+# posts/ab/ab12...ef.jpg: подкаталог по первым символам хеша, чтобы в
+# одной папке не копились сотни тысяч файлов
+HASHED_NAME = re.compile(r"(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}\.\w+$")
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """Хранилище, где имя файла - sha256 его содержимого.
+
+    Одинаковые картинки хранятся одним файлом под одним именем, поэтому
+    и миниатюры sorl у них общие. Каталог из upload_to сохраняется,
+    от исходного имени остается только расширение. Удалять файл можно,
+    только когда на него не ссылается ни один пост: см. images.release.
+    """
+
+    def _save(self, name, content):
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension
+        )
+        if self.exists(name):
+            # Свежее время изменения говорит images.release и gc_media,
+            # что файл снова в деле, хотя пост с ним еще не сохранен
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                # Файл удалили после проверки: запишем его заново
+                pass
+        # При гонке двух одинаковых загрузок FileSystemStorage сам
+        # выберет второму файлу свободное имя: будет копия, но не потеря
+        return super()._save(name, content)
+
+    def is_hashed(self, name):
+        """Имя дано этим хранилищем, а не осталось от старых загрузок."""
+        return bool(name and HASHED_NAME.search(name))
+
+
+image_storage = ContentHashStorage()
@@ -0,0 +1,11 @@
+from django import template
+
+from ..paginators import encode_cursor
+
+
+register = template.Library()
+
+
+@register.filter
+def cursor(post):
+    return encode_cursor(post)
@@ -0,0 +1,36 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..fragments import render_post_cards
+from ..thumbnails import accepts_webp, geometry, thumbnail
+
+
+register = template.Library()
+
+
+def _webp(context):
+    if "webp" in context:
+        return context["webp"]
+    request = context.get("request")
+    return request is not None and accepts_webp(request)
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, size_name):
+    """Карточки постов страницы, по возможности из кэша."""
+    cards = render_post_cards(
+        list(posts), geometry(size_name), _webp(context)
+    )
+    return [mark_safe(card) for card in cards]
+
+
+@register.simple_tag(takes_context=True)
+def post_thumbnail(context, image, size):
+    """Миниатюра в WebP, если браузер его принимает, иначе в JPEG."""
+    return thumbnail(image, size, _webp(context))
+
+
+@register.filter
+def thumbnail_size(size_name):
+    """Размер миниатюры из POST_THUMBNAIL_SIZES."""
+    return geometry(size_name)
@@ -2,6 +2,7 @@ from django.test import Client, TestCase
 from django.urls import reverse
 from django.core.cache import cache
 
+from ..cache import versions
 from ..models import Group, Post, User
 
 
@@ -15,6 +16,11 @@ class StaticURLTests(TestCase):
             slug="test-slug",
             description="Тестовое описание",
         )
+        cls.other_group = Group.objects.create(
+            title="Другая группа",
+            slug="other-slug",
+            description="Тестовое описание",
+        )
         cls.post = Post.objects.create(
             author=cls.user,
             text="Тестовый пост",
@@ -27,14 +33,33 @@ class StaticURLTests(TestCase):
         self.guest_client = Client()
 
     def test_cash_index_page(self):
-        """Проверка работы кэша для списка постов"""
+        """Повторный запрос главной страницы отдается из кэша"""
+        first_response = self.guest_client.get(reverse("posts:index"))
+        with self.assertNumQueries(0):
+            second_response = self.guest_client.get(reverse("posts:index"))
+        self.assertEqual(first_response.content, second_response.content)
+
+    def test_cash_index_page_invalidated_on_delete(self):
+        """Удаление поста сразу сбрасывает кэш главной страницы"""
         response = self.guest_client.get(reverse("posts:index"))
         first_response = response.content
-        self.post.delete()
-        response = self.guest_client.get(reverse("posts:index"))
-        second_response = response.content
-        self.assertEqual(first_response, second_response)
-        cache.clear()
+        Post.objects.get(pk=self.post.pk).delete()
         response = self.guest_client.get(reverse("posts:index"))
-        third_response = response.content
-        self.assertNotEqual(first_response, third_response)
+        self.assertNotEqual(first_response, response.content)
+        self.assertEqual(len(response.context["page_obj"]), 0)
+
+    def test_cash_new_post_bumps_only_its_group(self):
+        """Новый пост сбрасывает версию своей группы, но не чужой"""
+        group_version = versions(["group:%s" % self.group.pk])
+        other_version = versions(["group:%s" % self.other_group.pk])
+        Post.objects.create(author=self.user, text="Новый", group=self.group)
+        self.assertNotEqual(
+            versions(["group:%s" % self.group.pk]), group_version
+        )
+        self.assertEqual(
+            versions(["group:%s" % self.other_group.pk]), other_version
+        )
+        response = self.guest_client.get(
+            reverse("posts:list", kwargs={"slug": "test-slug"})
+        )
+        self.assertEqual(len(response.context["page_obj"]), 2)
@@ -0,0 +1,105 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+from .utils import QueryBudgetMixin
+
+
+class ConditionalGetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text="Тестовый пост",
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse("posts:post_detail", args=(cls.post.pk,)),
+            reverse("posts:profile", args=(cls.user.username,)),
+            reverse("posts:list", args=(cls.group.slug,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_revalidation_not_modified(self):
+        """Повторный запрос с ETag получает 304 за один запрос к БД"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)["ETag"]
+                with self.assertQueryBudget(1):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+
+    def test_changes_invalidate_etag(self):
+        """Новый комментарий и новый пост меняют ETag страниц"""
+        etags = [self.guest_client.get(url)["ETag"] for url in self.urls]
+        Comment.objects.create(post=self.post, author=self.user, text="Ок")
+        response = self.guest_client.get(
+            self.urls[0], HTTP_IF_NONE_MATCH=etags[0]
+        )
+        self.assertEqual(response.status_code, 200)
+        Post.objects.create(author=self.user, text="Еще", group=self.group)
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_expires_with_pages(self):
+        """Без bump() ETag меняется, когда истекает срок страниц
+
+        Так в кэше отдельного процесса устаревают изменения, сделанные
+        другими воркерами.
+        """
+        url = self.urls[0]
+        etag = self.guest_client.get(url)["ETag"]
+        later = time.time() + settings.POSTS_PAGE_CACHE_TIMEOUT + 1
+        with mock.patch("time.time", return_value=later):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_renamed_commenter_invalidates_etag(self):
+        """Новое имя комментатора меняет ETag страницы поста"""
+        commenter = User.objects.create_user(username="commenter")
+        Comment.objects.create(post=self.post, author=commenter, text="Ок")
+        etag = self.guest_client.get(self.urls[0])["ETag"]
+        commenter.username = "renamed"
+        commenter.save()
+        response = self.guest_client.get(
+            self.urls[0], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertContains(response, "renamed")
+
+    def test_etag_depends_on_user(self):
+        """Авторизованный пользователь не получает 304 по чужому ETag"""
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)["ETag"]
+                response = authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_missing_object_still_404(self):
+        """Для несуществующего поста по-прежнему 404"""
+        response = self.guest_client.get(
+            reverse("posts:post_detail", args=(self.post.pk + 100,)),
+            HTTP_IF_NONE_MATCH='"anything"',
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,137 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.other_group = Group.objects.create(
+            title="Другая группа",
+            slug="other-slug",
+            description="Тестовое описание",
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счетчики"""
+        post = Post.objects.create(
+            author=self.user, text="Тестовый пост", group=self.group
+        )
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_counter(self):
+        """Комментарии считаются в посте"""
+        post = Post.objects.create(author=self.user, text="Тестовый пост")
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text="Комментарий"
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счетчики обоих пользователей"""
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        author_stats = UserStats.objects.get(user=self.user)
+        reader_stats = UserStats.objects.get(user=self.reader)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(reader_stats.following_count, 1)
+        follow.delete()
+        author_stats.refresh_from_db()
+        reader_stats.refresh_from_db()
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(reader_stats.following_count, 0)
+
+    def test_counters_roll_back_with_row(self):
+        """Ошибка после счетчиков отменяет и пост, и счетчики"""
+        with mock.patch(
+            "posts.signals.cache.bump", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            Post.objects.create(
+                author=self.user, text="Тестовый пост", group=self.group
+            )
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(
+            UserStats.objects.filter(user=self.user, posts_count__gt=0)
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_drift_is_reported(self):
+        """Удаление поста мимо счетчика не прячется, а попадает в лог"""
+        Post.objects.bulk_create(
+            [Post(author=self.user, text="Без счетчиков", group=self.group)]
+        )
+        with self.assertLogs("posts.counters", "WARNING") as logs:
+            Post.objects.get().delete()
+        self.assertIn("rebuild_counters", logs.output[0])
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_rebuild_counters_command(self):
+        """rebuild_counters пересчитывает данные, созданные в обход save"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text="Пост %s" % i, group=self.group)
+            for i in range(3)
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.user)]
+        )
+        call_command("rebuild_counters", stdout=StringIO())
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.posts_count, 3)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+
+    def test_profile_counts_posts_once(self):
+        """Профиль считает посты только для пагинатора"""
+        Post.objects.create(author=self.user, text="Тестовый пост")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                reverse("posts:profile", kwargs={"username": "auth"})
+            )
+        self.assertEqual(response.context["stats"].posts_count, 1)
+        counts = [
+            query
+            for query in queries
+            if 'COUNT(*) AS "__count" FROM "posts_post"' in query["sql"]
+        ]
+        self.assertEqual(len(counts), 1)
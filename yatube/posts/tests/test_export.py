@@ -0,0 +1,104 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ExportDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="auth")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text="Пост %s" % number, group=cls.group
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader, text="Ок")
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output, ignore_errors=True)
+
+    def export(self, *args, **options):
+        call_command(
+            "export_data",
+            *args,
+            output=self.output,
+            chunk_size=2,
+            stdout=StringIO(),
+            **options
+        )
+
+    def read_jsonl(self, name):
+        path = os.path.join(self.output, name)
+        with open(path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_jsonl_all_models(self):
+        """Каждая модель выгружается в свой JSONL целиком"""
+        self.export()
+        posts = self.read_jsonl("posts.jsonl")
+        self.assertEqual(
+            [row["id"] for row in posts], [post.pk for post in self.posts]
+        )
+        self.assertEqual(posts[0]["text"], "Пост 0")
+        self.assertEqual(posts[0]["group_id"], self.group.pk)
+        self.assertEqual(len(self.read_jsonl("comments.jsonl")), 1)
+        self.assertEqual(len(self.read_jsonl("follows.jsonl")), 1)
+        self.assertEqual(len(self.read_jsonl("groups.jsonl")), 1)
+        users = self.read_jsonl("users.jsonl")
+        self.assertEqual(len(users), 2)
+        self.assertNotIn("password", users[0])
+
+    def test_csv_gzip(self):
+        """CSV с заголовком, сжатый gzip"""
+        self.export("groups", format="csv", gzip=True)
+        path = os.path.join(self.output, "groups.csv.gz")
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows[0][:3], ["id", "title", "slug"])
+        self.assertEqual(rows[1][1], "Тестовая группа")
+        self.assertEqual(os.listdir(self.output), ["groups.csv.gz"])
+
+    def test_state_watermark(self):
+        """Со --state второй запуск выгружает только новые строки"""
+        state = os.path.join(self.output, "state.json")
+        self.export("posts", "follows", state=state)
+        new_post = Post.objects.create(author=self.user, text="Новый")
+        self.export("posts", "follows", state=state)
+        self.assertEqual(
+            [row["id"] for row in self.read_jsonl("posts.jsonl")],
+            [new_post.pk],
+        )
+        self.assertEqual(self.read_jsonl("follows.jsonl"), [])
+        with open(state) as file:
+            self.assertEqual(
+                json.load(file),
+                {"posts": new_post.pk, "follows": Follow.objects.get().pk},
+            )
+
+    def test_since(self):
+        """--since отбирает посты по времени изменения"""
+        edited = self.posts[1]
+        Post.objects.exclude(pk=edited.pk).update(updated="2000-01-01T00:00")
+        self.export("posts", since="2020-01-01")
+        self.assertEqual(
+            [row["id"] for row in self.read_jsonl("posts.jsonl")],
+            [edited.pk],
+        )
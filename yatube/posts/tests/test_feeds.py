@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from .utils import QueryBudgetMixin
+
+
+class FeedTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        cls.other_user = User.objects.create_user(username="other")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.group_post = Post.objects.create(
+            author=cls.user,
+            text="Пост в группе",
+            group=cls.group,
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.other_user,
+            text="Пост без группы",
+        )
+        cls.feeds = {
+            reverse("posts:rss"): (cls.group_post, cls.other_post),
+            reverse("posts:atom"): (cls.group_post, cls.other_post),
+            reverse("posts:group_rss", args=(cls.group.slug,)): (
+                cls.group_post,
+            ),
+            reverse("posts:group_atom", args=(cls.group.slug,)): (
+                cls.group_post,
+            ),
+            reverse("posts:author_rss", args=(cls.other_user.username,)): (
+                cls.other_post,
+            ),
+            reverse("posts:author_atom", args=(cls.other_user.username,)): (
+                cls.other_post,
+            ),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_feeds_contain_their_posts(self):
+        """В ленте только посты своей области"""
+        posts = (self.group_post, self.other_post)
+        for url, expected in self.feeds.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                content = response.content.decode()
+                for post in posts:
+                    link = reverse("posts:post_detail", args=(post.pk,))
+                    self.assertEqual(link in content, post in expected)
+
+    def test_feed_content_types(self):
+        """RSS и Atom отдаются со своими типами"""
+        response = self.guest_client.get(reverse("posts:rss"))
+        self.assertTrue(response["Content-Type"].startswith("application/rss"))
+        response = self.guest_client.get(reverse("posts:atom"))
+        self.assertTrue(
+            response["Content-Type"].startswith("application/atom")
+        )
+
+    def test_feeds_cached_and_conditional(self):
+        """Повтор из кэша, а опрос с ETag получает 304"""
+        for url in self.feeds:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertQueryBudget(1):
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+                with self.assertQueryBudget(1):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=first["ETag"]
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_post_updates_feed(self):
+        """Новый пост сразу появляется в ленте группы"""
+        url = reverse("posts:group_rss", args=(self.group.slug,))
+        etag = self.guest_client.get(url)["ETag"]
+        post = Post.objects.create(
+            author=self.user, text="Свежий", group=self.group
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, reverse("posts:post_detail", args=(post.pk,))
+        )
+
+    def test_unknown_group_feed_404(self):
+        """Лента несуществующей группы отвечает 404"""
+        response = self.guest_client.get(
+            reverse("posts:group_rss", args=("missing",))
+        )
+        self.assertEqual(response.status_code, 404)
@@ -1,9 +1,12 @@
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.cache import cache
 from itertools import islice
 
-from ..models import Group, Post, Follow, User
+from ..counters import rebuild
+from ..feed import backfill_followers
+from ..models import FeedEntry, Group, Post, Follow, User
+from ..paginators import encode_cursor
 
 
 class FollowingTests(TestCase):
@@ -81,3 +84,83 @@ class FollowingTests(TestCase):
             reverse("posts:follow_index")
         )
         self.assertNotIn(post, response_another_follower.context["page_obj"])
+
+    def test_new_post_fan_out_to_followers(self):
+        """Новый пост автора попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.user2, author=self.user)
+        post = Post.objects.create(author=self.user, text="Новый пост")
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user2, post=post).exists()
+        )
+        response = self.second_author.get(reverse("posts:follow_index"))
+        self.assertEqual(response.context["page_obj"][0], post)
+
+    def test_follow_backfills_and_unfollow_purges_feed(self):
+        """Подписка заполняет ленту старыми постами, отписка очищает"""
+        self.second_author.get(
+            reverse("posts:profile_follow", kwargs={"username": "auth"})
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.user2).count(),
+            self.COUNT_CREATW_POST,
+        )
+        self.second_author.get(
+            reverse("posts:profile_unfollow", kwargs={"username": "auth"})
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.user2).exists())
+
+    def test_follow_feed_cursor_page(self):
+        """Лента подписок листается курсором"""
+        Follow.objects.create(user=self.user2, author=self.user)
+        newest = Post.objects.order_by("-pub_date", "-id").first()
+        response = self.second_author.get(
+            reverse("posts:follow_index"), {"after": encode_cursor(newest)}
+        )
+        page_obj = response.context["page_obj"]
+        self.assertEqual(len(page_obj), self.COUNT_CREATW_POST - 1)
+        self.assertNotIn(newest, page_obj)
+        self.assertFalse(page_obj.has_next())
+
+    @override_settings(FEED_FANOUT_THRESHOLD=2)
+    def test_celebrity_posts_pulled_at_read_time(self):
+        """Посты знаменитости не пишутся в ленты, но видны в них"""
+        celebrity = User.objects.create_user(username="Celebrity")
+        Follow.objects.create(user=self.user2, author=celebrity)
+        Follow.objects.create(user=self.user, author=celebrity)
+        Follow.objects.create(user=self.user2, author=self.user)
+        pushed = Post.objects.create(author=self.user, text="Обычный")
+        pulled = Post.objects.create(author=celebrity, text="Звездный")
+        self.assertFalse(FeedEntry.objects.filter(post=pulled).exists())
+        self.assertTrue(FeedEntry.objects.filter(post=pushed).exists())
+        response = self.second_author.get(reverse("posts:follow_index"))
+        page_obj = response.context["page_obj"]
+        self.assertEqual(page_obj[0], pulled)
+        self.assertEqual(page_obj[1], pushed)
+        self.assertEqual(len(page_obj), self.COUNT_CREATW_POST + 2)
+        response = self.second_author.get(
+            reverse("posts:follow_index"), {"after": encode_cursor(pulled)}
+        )
+        self.assertEqual(response.context["page_obj"][0], pushed)
+
+    @override_settings(FEED_BACKFILL_LIMIT=1, FEED_FANOUT_THRESHOLD=2)
+    def test_backfill_followers_in_one_statement(self):
+        """Заполнение лент пачкой берет последние посты и пропускает
+        знаменитостей"""
+        celebrity = User.objects.create_user(username="Celebrity")
+        Post.objects.create(author=celebrity, text="Звездный")
+        Follow.objects.bulk_create(
+            [
+                Follow(user=self.user2, author=self.user),
+                Follow(user=self.user2, author=celebrity),
+                Follow(user=self.user, author=celebrity),
+            ]
+        )
+        rebuild()
+        with self.assertNumQueries(1):
+            filled = backfill_followers([self.user.pk, celebrity.pk])
+        newest = Post.objects.filter(author=self.user).first()
+        self.assertEqual(filled, 1)
+        self.assertEqual(
+            list(FeedEntry.objects.values_list("user", "post")),
+            [(self.user2.pk, newest.pk)],
+        )
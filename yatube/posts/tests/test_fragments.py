@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..fragments import post_cards_rendered
+from ..models import Group, Post, User
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        for i in range(3):
+            Post.objects.create(
+                author=cls.user, text="Пост %s" % i, group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reports = []
+        post_cards_rendered.connect(self.collect)
+
+    def tearDown(self):
+        post_cards_rendered.disconnect(self.collect)
+
+    def collect(self, sender, hits, misses, **kwargs):
+        self.reports.append((hits, misses))
+
+    def test_cards_shared_between_feeds(self):
+        """Карточки группы переиспользуются на странице профиля"""
+        self.guest_client.get(
+            reverse("posts:list", kwargs={"slug": "test-slug"})
+        )
+        self.guest_client.get(
+            reverse("posts:profile", kwargs={"username": "auth"})
+        )
+        self.assertEqual(self.reports, [(0, 3), (3, 0)])
+
+    def test_edited_post_card_rendered_again(self):
+        """Правка поста заново рисует только его карточку"""
+        self.guest_client.get(reverse("posts:index"))
+        post = Post.objects.first()
+        post.text = "Исправленный текст"
+        post.save()
+        response = self.guest_client.get(reverse("posts:index"))
+        self.assertEqual(self.reports, [(0, 3), (2, 1)])
+        self.assertContains(response, "Исправленный текст")
+
+    def test_renamed_author_and_group_render_again(self):
+        """Новое имя автора и название группы сразу видны в карточках"""
+        urls = (
+            reverse("posts:list", kwargs={"slug": "test-slug"}),
+            reverse("posts:profile", kwargs={"username": "auth"}),
+        )
+        etags = [self.guest_client.get(url)["ETag"] for url in urls]
+        self.group.title = "Новое название"
+        self.group.save()
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(
+                    response, "все записи группы: Новое название"
+                )
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        self.user.first_name = "Лев"
+        self.user.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, "Автор: Лев")
+        self.assertEqual(self.reports, [(0, 3), (3, 0)] * 3)
+
+    def test_login_keeps_cards(self):
+        """Вход автора не сбрасывает его страницы и карточки"""
+        self.user.set_password("secret")
+        self.user.save()
+        url = reverse("posts:profile", kwargs={"username": "auth"})
+        self.guest_client.get(url)
+        Client().login(username="auth", password="secret")
+        self.guest_client.get(url)
+        self.assertEqual(self.reports, [(0, 3)])
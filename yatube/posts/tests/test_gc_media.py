@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .. import thumbnails
+from ..management.commands.gc_media import Command
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GcMediaTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # kvstore sorl кэширует записи и помнит миниатюры прошлых тестов
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        buffer = BytesIO()
+        Image.new("RGB", (30, 20), "red").save(buffer, "PNG")
+        self.post = Post.objects.create(
+            author=User.objects.create_user(username="keeper"),
+            text="Живой пост",
+            image=SimpleUploadedFile("live.png", buffer.getvalue()),
+        )
+        self.thumbnail = thumbnails.thumbnail(self.post.image, "200", False)
+        self.orphan = self.write("posts/ab/" + "ab" * 32 + ".jpg", 2048)
+        self.orphan_thumbnail = self.write(
+            "cache/12/34/" + "1234" * 8 + ".jpg", 1024
+        )
+        self.checkpoint = self.write("cache/warm_thumbnails.checkpoint", 3)
+        self.age(TEMP_MEDIA_ROOT)
+
+    def write(self, name, size):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(b"x" * size)
+        return path
+
+    def age(self, root, seconds=2 * 3600):
+        past = time.time() - seconds
+        for path, dirs, files in os.walk(root):
+            for name in files:
+                os.utime(os.path.join(path, name), (past, past))
+
+    def gc(self, **options):
+        out = StringIO()
+        call_command("gc_media", rate=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_only_reports(self):
+        """В режиме dry-run файлы остаются, отчет показывает объем"""
+        output = self.gc(dry_run=True)
+        self.assertIn("Будет удалено файлов: 2", output)
+        self.assertTrue(os.path.exists(self.orphan))
+        self.assertTrue(os.path.exists(self.orphan_thumbnail))
+
+    def test_removes_only_unreferenced_files(self):
+        """Удаляются только файлы без ссылок из постов и kvstore"""
+        output = self.gc(batch_size=1)
+        self.assertIn("Удалено файлов: 2", output)
+        self.assertFalse(os.path.exists(self.orphan))
+        self.assertFalse(os.path.exists(self.orphan_thumbnail))
+        self.assertTrue(os.path.exists(self.post.image.path))
+        self.assertTrue(self.thumbnail.exists())
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+    def test_recent_files_kept(self):
+        """Свежие файлы не удаляются: их пост может быть еще не сохранен"""
+        os.utime(self.orphan)
+        self.gc()
+        self.assertTrue(os.path.exists(self.orphan))
+        self.assertFalse(os.path.exists(self.orphan_thumbnail))
+
+    def test_references_rechecked_before_removal(self):
+        """Файл, на который сослался пост после сбора ссылок, остается"""
+        with mock.patch.object(Command, "mark", return_value=(set(), set())):
+            self.gc()
+        self.assertTrue(os.path.exists(self.post.image.path))
+        self.assertFalse(os.path.exists(self.orphan))
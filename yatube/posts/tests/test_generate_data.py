@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Post, User
+
+
+class GenerateDataTests(TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output, ignore_errors=True)
+        call_command(
+            "generate_data",
+            output=self.output,
+            users=50,
+            groups=3,
+            posts=200,
+            comments=3,
+            follows=5,
+            stdout=StringIO(),
+        )
+
+    def read(self, name):
+        path = os.path.join(self.output, name + ".jsonl")
+        with open(path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_follow_graph(self):
+        """Подписки без повторов и на себя, популярность неравномерна"""
+        follows = self.read("follows")
+        pairs = [(row["user_id"], row["author_id"]) for row in follows]
+        self.assertEqual(len(pairs), len(set(pairs)))
+        self.assertFalse([pair for pair in pairs if pair[0] == pair[1]])
+        followers = Counter(author for user, author in pairs)
+        self.assertGreater(followers[1], followers.get(50, 0))
+
+    def test_replies_stay_in_post(self):
+        """Ответ ссылается на более ранний комментарий того же поста"""
+        comments = {row["id"]: row for row in self.read("comments")}
+        replies = [row for row in comments.values() if row["parent_id"]]
+        self.assertTrue(replies)
+        for row in replies:
+            parent = comments[row["parent_id"]]
+            self.assertEqual(parent["post_id"], row["post_id"])
+            self.assertLess(parent["id"], row["id"])
+
+    def test_loads_with_import_data(self):
+        """Набор загружается import_data целиком"""
+        call_command("import_data", self.output, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), len(self.read("comments")))
+        self.assertEqual(Follow.objects.count(), len(self.read("follows")))
+        self.assertFalse(Comment.objects.filter(path="").exists())
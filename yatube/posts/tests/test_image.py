@@ -1,12 +1,22 @@
-from django.test import TestCase, Client, override_settings
+from django.test import SimpleTestCase, TestCase, Client, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from django.core.cache import cache
+import os
 import shutil
 import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
+from sorl.thumbnail.parsers import parse_geometry
 from django.conf import settings
+from django.core.management import call_command
 
+from ..forms import PostForm
 from ..models import Group, Post, User, Comment
+from .. import thumbnails
+from ..thumbnail_engine import Engine
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -130,3 +140,284 @@ class ImageTests(TestCase):
         new_comment = Comment.objects.get(id=1).text
         # Проверяем, появился ли комент
         self.assertEqual(new_comment, "Новый комент")
+
+    def test_thumbnails_scheduled_on_upload(self):
+        """После загрузки картинки миниатюры ставятся в очередь"""
+        uploaded = SimpleUploadedFile(
+            name="eager.gif", content=self.small_gif, content_type="image/gif"
+        )
+        with mock.patch(
+            "posts.forms.transaction.on_commit", lambda func: func()
+        ), mock.patch.object(thumbnails, "generate_later") as generate:
+            self.authorized_client.post(
+                reverse("posts:post_create"),
+                data={"text": "С картинкой", "image": uploaded},
+            )
+            self.authorized_client.post(
+                reverse("posts:edit", args=[self.post.id]),
+                data={"text": "Без новой картинки"},
+            )
+        post = Post.objects.get(text="С картинкой")
+        generate.assert_called_once_with(post.image)
+
+    def test_thumbnails_generate_all_sizes(self):
+        """generate создает миниатюры всех размеров из настроек"""
+        cache_dir = os.path.join(TEMP_MEDIA_ROOT, "cache")
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        thumbnails.generate(self.post.image.name)
+        created = []
+        for root, dirs, files in os.walk(cache_dir):
+            created.extend(files)
+        # JPEG и WebP для каждого размера
+        self.assertEqual(
+            len(created), 2 * len(settings.POST_THUMBNAIL_SIZES)
+        )
+        self.assertEqual(
+            len([name for name in created if name.endswith(".webp")]),
+            len(settings.POST_THUMBNAIL_SIZES),
+        )
+
+    def test_warm_skips_ready_thumbnails(self):
+        """warm создает только недостающие миниатюры"""
+        shutil.rmtree(
+            os.path.join(TEMP_MEDIA_ROOT, "cache"), ignore_errors=True
+        )
+        sizes = list(settings.POST_THUMBNAIL_SIZES.values())
+        name = self.post.image.name
+        self.assertEqual(thumbnails.warm(name, sizes), 2 * len(sizes))
+        self.assertEqual(thumbnails.warm(name, sizes), 0)
+        thumbnails.thumbnail_file(name, sizes[0]).delete()
+        self.assertEqual(thumbnails.warm(name, sizes), 1)
+        self.assertTrue(thumbnails.thumbnail_file(name, sizes[0]).exists())
+
+    def test_thumbnail_format_follows_accept(self):
+        """Браузер с image/webp в Accept получает WebP, остальные JPEG"""
+        url = reverse("posts:post_detail", args=[self.post.id])
+        response = self.guest_client.get(
+            url, HTTP_ACCEPT="image/avif,image/webp,*/*"
+        )
+        self.assertContains(response, ".webp")
+        self.assertIn("Accept", response["Vary"])
+        response = self.guest_client.get(url, HTTP_ACCEPT="*/*")
+        self.assertNotContains(response, ".webp")
+        self.assertContains(response, ".jpg")
+
+    def test_cached_pages_vary_on_accept(self):
+        """Закэшированная лента не отдает WebP браузеру без его поддержки"""
+        url = reverse("posts:index")
+        response = self.guest_client.get(url, HTTP_ACCEPT="image/webp")
+        self.assertContains(response, ".webp")
+        self.assertIn("Accept", response["Vary"])
+        response = self.guest_client.get(url, HTTP_ACCEPT="*/*")
+        self.assertNotContains(response, ".webp")
+
+    def test_warm_thumbnails_command(self):
+        """Команда обходит картинки постов и удаляет чекпоинт в конце"""
+        shutil.rmtree(
+            os.path.join(TEMP_MEDIA_ROOT, "cache"), ignore_errors=True
+        )
+        out = StringIO()
+        call_command("warm_thumbnails", workers=1, stdout=out)
+        self.assertIn("1/1", out.getvalue())
+        self.assertTrue(
+            thumbnails.thumbnail_file(self.post.image.name, "200").exists()
+        )
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(
+                    TEMP_MEDIA_ROOT, "cache", "warm_thumbnails.checkpoint"
+                )
+            )
+        )
+
+
+class JpegSource:
+    name = "photo.jpg"
+
+    def __init__(self, size):
+        buffer = BytesIO()
+        Image.new("RGB", size, "red").save(buffer, "JPEG")
+        self.data = buffer.getvalue()
+
+    def read(self):
+        return self.data
+
+
+class ThumbnailEngineTests(SimpleTestCase):
+    options = {
+        "format": "JPEG",
+        "colorspace": "RGB",
+        "upscale": False,
+        "crop": False,
+        "cropbox": None,
+        "rounded": None,
+        "padding": False,
+    }
+
+    def test_jpeg_decoded_at_reduced_scale(self):
+        """Большой JPEG декодируется в уменьшенном масштабе"""
+        engine = Engine()
+        image = engine.get_image(JpegSource((4000, 3000)))
+        geometry = parse_geometry("200", 4000 / 3000)
+        thumbnail = engine.create(image, geometry, self.options)
+        self.assertEqual(thumbnail.size, (200, 150))
+        self.assertEqual(image.size, (500, 375))
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_refuses_huge_images(self):
+        """Картинки больше IMAGE_MAX_PIXELS не декодируются"""
+        with self.assertRaises(Image.DecompressionBombError):
+            Engine().get_image(JpegSource((100, 100)))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageIngestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="photographer")
+
+    def upload(self, image, name, **params):
+        buffer = BytesIO()
+        image.save(buffer, **params)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def save_form(self, upload):
+        form = PostForm(
+            data={"text": "Фото"},
+            files={"image": upload},
+            instance=Post(author=self.user),
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def test_large_photo_rotated_resized_and_stripped(self):
+        """Фото поворачивается по EXIF, уменьшается и теряет EXIF"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = "Phone"
+        upload = self.upload(
+            Image.new("RGB", (3000, 1000), "green"),
+            "photo.jpg",
+            format="JPEG",
+            exif=exif,
+        )
+        with override_settings(IMAGE_MAX_EDGE=600):
+            post = self.save_form(upload)
+        self.assertEqual((post.image_width, post.image_height), (200, 600))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (200, 600))
+            self.assertFalse(stored.getexif())
+
+    def test_small_clean_image_kept_as_is(self):
+        """Небольшая картинка без метаданных сохраняется без пережатия"""
+        upload = self.upload(
+            Image.new("RGB", (40, 30), "blue"), "small.png", format="PNG"
+        )
+        original = upload.read()
+        upload.seek(0)
+        post = self.save_form(upload)
+        self.assertEqual((post.image_width, post.image_height), (40, 30))
+        with open(post.image.path, "rb") as stored:
+            self.assertEqual(stored.read(), original)
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_decompression_bomb_rejected(self):
+        """Слишком большая по пикселям картинка не принимается"""
+        form = PostForm(
+            data={"text": "Бомба"},
+            files={
+                "image": self.upload(
+                    Image.new("L", (20, 20)), "bomb.png", format="PNG"
+                )
+            },
+            instance=Post(author=self.user),
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("image", form.errors)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="reposter")
+
+    def setUp(self):
+        patcher = mock.patch(
+            "posts.signals.transaction.on_commit", lambda func: func()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self, color="red"):
+        buffer = BytesIO()
+        Image.new("RGB", (30, 20), color).save(buffer, "PNG")
+        return Post.objects.create(
+            author=self.user,
+            text="Репост",
+            image=SimpleUploadedFile("repost.png", buffer.getvalue()),
+        )
+
+    def age(self, path, seconds=3600):
+        """Файл записан давно, а не только что."""
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    def test_same_bytes_share_file_and_thumbnails(self):
+        """Одинаковые картинки хранятся одним файлом с общими миниатюрами"""
+        first = self.create_post()
+        second = self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r"^posts/[0-9a-f]{2}/\w{64}\.png$")
+        self.assertNotEqual(
+            self.create_post("blue").image.name, first.image.name
+        )
+        sizes = ["200"]
+        self.assertEqual(thumbnails.warm(first.image.name, sizes), 2)
+        self.assertEqual(thumbnails.warm(second.image.name, sizes), 0)
+
+    def test_file_deleted_with_last_post(self):
+        """Файл и миниатюры удаляются вместе с последним постом"""
+        first = self.create_post("green")
+        second = self.create_post("green")
+        path = first.image.path
+        thumbnail = thumbnails.thumbnail(first.image, "200", False)
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.age(path)
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(thumbnail.exists())
+
+    def test_reused_file_survives_release(self):
+        """Повторная загрузка освежает файл, и release его не удаляет,
+        пока новый пост может быть еще не сохранен"""
+        first = self.create_post("purple")
+        path = first.image.path
+        self.age(path)
+        second = self.create_post("purple")
+        self.assertGreater(os.path.getmtime(path), time.time() - 60)
+        # Второй пост еще не сохранен, когда первый отпускает файл
+        Post.objects.filter(pk=second.pk).delete()
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+
+    def test_replaced_image_released(self):
+        """Замененная картинка удаляется, если больше ни на что не нужна"""
+        post = self.create_post("yellow")
+        path = post.image.path
+        self.age(path)
+        post.image = ""
+        post.save()
+        self.assertFalse(os.path.exists(path))
+
+    def test_foreign_paths_left_alone(self):
+        """Файлы со старыми именами не удаляются вместе с постом"""
+        post = Post.objects.create(
+            author=self.user, text="Старый пост", image="posts/legacy.jpg"
+        )
+        with mock.patch("posts.images.delete") as delete:
+            post.delete()
+        delete.assert_not_called()
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, FeedEntry, Follow, Group, Post, User
+from ..search import matching_ids
+
+
+class ImportDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text="Пост про ежиков", group=cls.group
+        )
+        Post.objects.filter(pk=cls.post.pk).update(
+            pub_date="2020-05-01T12:00Z"
+        )
+        root = Comment.objects.create(
+            post=cls.post, author=cls.reader, text="Корень"
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text="Ответ", parent=root
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.dump = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dump, ignore_errors=True)
+        call_command("export_data", output=self.dump, stdout=StringIO())
+
+    def load(self):
+        out = StringIO()
+        call_command("import_data", self.dump, batch_size=1, stdout=out)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        """После очистки база восстанавливается из выгрузки целиком"""
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        out = self.load()
+        self.assertIn("строк/с", out)
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, "author")
+        self.assertEqual(post.group.slug, "test-slug")
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(post.author.stats.posts_count, 1)
+        self.assertEqual(post.author.stats.followers_count, 1)
+        root, reply = post.comments.order_by("path")
+        self.assertEqual(reply.parent, root)
+        self.assertTrue(reply.path.startswith(root.path))
+        self.assertEqual(reply.depth, 1)
+        self.assertTrue(
+            Post.objects.filter(pk__in=matching_ids("ежиков")).exists()
+        )
+        reader = User.objects.get(username="reader")
+        self.assertTrue(
+            FeedEntry.objects.filter(user=reader, post=post).exists()
+        )
+
+    def test_import_next_to_existing_rows(self):
+        """Существующие пользователи и группы переиспользуются"""
+        self.load()
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 2)
+        copy = Post.objects.exclude(pk=self.post.pk).get()
+        self.assertEqual(copy.author, self.author)
+        self.assertEqual(copy.comments.count(), 2)
+        self.assertEqual(
+            Post.objects.create(author=self.author, text="Новый").pk,
+            copy.pk + 1,
+        )
+
+    def test_orphaned_comments_skipped(self):
+        """Комментарий к незагруженному посту пропускается вместе с ответом"""
+        path = os.path.join(self.dump, "comments.jsonl")
+        orphan = {
+            "id": 1000,
+            "post_id": self.post.pk + 1000,
+            "author_id": self.reader.pk,
+            "parent_id": None,
+            "text": "Сирота",
+            "created": "2020-05-01T12:00:00Z",
+        }
+        reply = dict(orphan, id=1001, post_id=self.post.pk, parent_id=1000)
+        with open(path, "a", encoding="utf-8") as file:
+            for row in (orphan, reply):
+                file.write(json.dumps(row) + "\n")
+        out = self.load()
+        self.assertIn("comments: 2 строк", out)
+        self.assertIn("пропущено 2", out)
+        copy = Post.objects.exclude(pk=self.post.pk).get()
+        self.assertEqual(copy.comments.count(), 2)
+        self.assertFalse(Comment.objects.filter(text="Сирота").exists())
@@ -0,0 +1,109 @@
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент идут по индексам без сортировки во временном B-tree.
+
+    Проверяются настоящие запросы view: они перехватываются и
+    прогоняются через EXPLAIN QUERY PLAN.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(12):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text="Пост %s" % number
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.create(post=cls.post, author=cls.reader, text="Ок")
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plans(self, url, table):
+        """Планы запросов страницы к table с сортировкой."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {"page": 2})
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query["sql"]
+                if 'FROM "%s"' % table not in sql or "ORDER BY" not in sql:
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                plans.append(" | ".join(row[-1] for row in cursor.fetchall()))
+        self.assertTrue(plans, "Нет запросов к %s" % table)
+        return plans
+
+    def assertUsesIndex(self, url, table, index):
+        for plan in self.plans(url, table):
+            self.assertIn("INDEX %s" % index, plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_index(self):
+        """Главная читает посты по индексу даты"""
+        self.assertUsesIndex(reverse("posts:index"), "posts_post", "post_date")
+
+    def test_group_list(self):
+        """Лента группы идет по индексу (group, -pub_date, -id)"""
+        self.assertUsesIndex(
+            reverse("posts:list", args=["group"]),
+            "posts_post",
+            "post_group_date",
+        )
+
+    def test_profile(self):
+        """Профиль идет по индексу (author, -pub_date, -id)"""
+        self.assertUsesIndex(
+            reverse("posts:profile", args=["author"]),
+            "posts_post",
+            "post_author_date",
+        )
+
+    def test_follow_index(self):
+        """Лента подписок идет по индексу FeedEntry"""
+        self.assertUsesIndex(
+            reverse("posts:follow_index"),
+            "posts_feedentry",
+            "feed_user_date",
+        )
+
+    def test_post_detail_comments(self):
+        """Комментарии поста идут по индексу (post, path)"""
+        self.assertUsesIndex(
+            reverse("posts:post_detail", args=[self.post.pk]),
+            "posts_comment",
+            "comment_post_path",
+        )
+
+    def test_post_comments_default_ordering(self):
+        """post.comments по сортировке модели идут по (post, -created)"""
+        sql, params = self.post.comments.all().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " | ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("INDEX comment_post_created", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_follow_is_unique(self):
+        """Повторную подписку на того же автора не пропускает БД"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+        self.client.get(reverse("posts:profile_follow", args=["author"]))
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 1
+        )
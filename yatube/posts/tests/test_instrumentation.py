@@ -0,0 +1,76 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, User
+
+
+def timing(response):
+    """Метрики Server-Timing как {имя: {параметр: значение}}."""
+    metrics = {}
+    for entry in response["Server-Timing"].split(", "):
+        name, *params = entry.split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+@override_settings(SERVER_TIMING=True)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        for number in range(3):
+            Post.objects.create(author=cls.author, text="Пост %s" % number)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_server_timing_counts_queries(self):
+        """Server-Timing сообщает число запросов и время частей ответа"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("posts:index"))
+        metrics = timing(response)
+        self.assertEqual(
+            metrics["db"]["desc"], '"%d queries"' % len(queries)
+        )
+        for name in ("db", "render", "total"):
+            self.assertGreaterEqual(float(metrics[name]["dur"]), 0)
+
+    def test_cache_hits_and_misses(self):
+        """Промах страницы и карточек, затем попадание в кэш страницы"""
+        url = reverse("posts:index")
+        first = timing(self.client.get(url))
+        self.assertEqual(first["cache"]["desc"], '"hits=0 misses=4"')
+        second = timing(self.client.get(url))
+        self.assertEqual(second["cache"]["desc"], '"hits=1 misses=0"')
+        self.assertEqual(second["render"]["dur"], "0.0")
+
+    def test_log_line_tagged_with_view_name(self):
+        """В лог пишется строка с именем view и метриками"""
+        with self.assertLogs("core.instrumentation", "INFO") as logs:
+            self.client.get(reverse("posts:profile", args=["author"]))
+        self.assertRegex(
+            logs.output[0],
+            r"view=posts:profile method=GET status=200 total_ms=[\d.]+ "
+            r"db_queries=\d+",
+        )
+        record = logs.records[0]
+        self.assertEqual(record.request_metrics["view"], "posts:profile")
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_logged_as_warning(self):
+        """Медленный запрос пишется с уровнем WARNING"""
+        with self.assertLogs("core.instrumentation", "WARNING") as logs:
+            self.client.get("/missing-page/")
+        self.assertTrue(re.search(r"view=- .*status=404", logs.output[0]))
+
+    @override_settings(SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        """Заголовок можно отключить настройкой"""
+        response = self.client.get(reverse("posts:index"))
+        self.assertFalse(response.has_header("Server-Timing"))
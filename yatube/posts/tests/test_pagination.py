@@ -1,10 +1,15 @@
+import re
 from django.test import TestCase, Client
 from django.urls import reverse
 from itertools import islice
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 
-from ..models import Group, Post, User
+from ..models import Comment, Group, Post, User
+from ..paginators import encode_cursor
+from ..views import COMMENTS_PER_PAGE
 
 
 class PaginatorViewsTest(TestCase):
@@ -100,3 +105,137 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(
             len(response.context["page_obj"]), self.count_post_in_last_page
         )
+
+    def test_index_cursor_pages_match_numbered_pages(self):
+        """Курсор ?after= отдает ту же вторую страницу, что и ?page=2"""
+        first_page = self.client.get(reverse("posts:index")).context[
+            "page_obj"
+        ]
+        second_page = self.client.get(
+            reverse("posts:index") + "?page=2"
+        ).context["page_obj"]
+        response = self.client.get(
+            reverse("posts:index"),
+            {"after": encode_cursor(first_page[len(first_page) - 1])},
+        )
+        cursor_page = response.context["page_obj"]
+        self.assertEqual(list(cursor_page), list(second_page))
+        self.assertTrue(cursor_page.has_previous())
+        self.assertTrue(cursor_page.has_next())
+
+    def test_group_list_cursor_before_returns_previous_page(self):
+        """Курсор ?before= возвращает предыдущую страницу"""
+        url = reverse("posts:list", kwargs={"slug": "test-slug"})
+        first_page = self.client.get(url).context["page_obj"]
+        second_page = self.client.get(url + "?page=2").context["page_obj"]
+        response = self.client.get(
+            url, {"before": encode_cursor(second_page[0])}
+        )
+        cursor_page = response.context["page_obj"]
+        self.assertEqual(list(cursor_page), list(first_page))
+        self.assertFalse(cursor_page.has_previous())
+
+    def test_profile_cursor_last_page(self):
+        """Последняя страница по курсору без ссылки вперед"""
+        url = reverse("posts:profile", kwargs={"username": "auth"})
+        last_page = self.client.get(
+            url + "?page=" + str(self.count_page)
+        ).context["page_obj"]
+        response = self.client.get(
+            url, {"after": encode_cursor(last_page[len(last_page) - 1])}
+        )
+        cursor_page = response.context["page_obj"]
+        self.assertEqual(len(cursor_page), self.count_post_in_last_page)
+        self.assertFalse(cursor_page.has_next())
+
+    def test_cursor_page_does_not_count_posts(self):
+        """Страница по курсору не выполняет COUNT(*)"""
+        post = Post.objects.order_by("-pub_date", "-id")[50]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse("posts:index"), {"after": encode_cursor(post)}
+            )
+        for query in queries:
+            self.assertNotIn("COUNT(", query["sql"])
+
+    def test_cursor_past_the_ends_returns_first_page(self):
+        """Курсор за крайним постом отдает первую страницу, а не 500"""
+        posts = Post.objects.order_by("-pub_date", "-id")
+        for params in (
+            {"before": encode_cursor(posts.first())},
+            {"after": encode_cursor(posts.last())},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(reverse("posts:index"), params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    list(response.context["page_obj"]),
+                    list(posts[: self.COUNT_POST_IN_PAGE]),
+                )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор отдает первую страницу"""
+        response = self.client.get(reverse("posts:index"), {"after": "%%%"})
+        self.assertEqual(
+            len(response.context["page_obj"]), self.COUNT_POST_IN_PAGE
+        )
+
+
+class CommentPaginationTests(TestCase):
+    COUNT_COMMENTS = 45
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="commenter")
+        cls.post = Post.objects.create(author=cls.user, text="Обсуждаемый")
+        # По одному: путь в ветке комментарий получает после сохранения
+        for i in range(cls.COUNT_COMMENTS):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text="Комментарий %s" % i
+            )
+
+    def more_link(self, html):
+        found = re.search(r'data-more-comments\s+href="([^"]+)"', html)
+        return found and found.group(1).replace("&amp;", "&")
+
+    def test_post_detail_shows_first_page_only(self):
+        """Пост показывает одну страницу комментариев без COUNT(*)"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("posts:post_detail", args=[self.post.pk])
+            )
+        self.assertEqual(len(response.context["comments"]), COMMENTS_PER_PAGE)
+        self.assertIsNotNone(self.more_link(response.content.decode()))
+        for query in queries:
+            self.assertNotIn("COUNT(", query["sql"])
+
+    def test_fragments_walk_all_comments(self):
+        """Пачки по курсору отдают все комментарии ровно по одному разу"""
+        seen = []
+        url = reverse("posts:comments", args=[self.post.pk])
+        while url:
+            response = self.client.get(url)
+            seen.extend(
+                comment.pk for comment in response.context["comments"]
+            )
+            url = self.more_link(response.content.decode())
+        expected = list(
+            Comment.objects.filter(post=self.post)
+            .order_by("path")
+            .values_list("pk", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_broken_cursor_returns_first_batch(self):
+        """Испорченный курсор отдает первую пачку"""
+        response = self.client.get(
+            reverse("posts:comments", args=[self.post.pk]), {"after": "%%%"}
+        )
+        self.assertEqual(len(response.context["comments"]), COMMENTS_PER_PAGE)
+
+    def test_missing_post_not_found(self):
+        """Комментарии несуществующего поста отдают 404"""
+        response = self.client.get(
+            reverse("posts:comments", args=[self.post.pk + 100])
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from .utils import QueryBudgetMixin
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Число запросов страниц не зависит от числа постов на них.
+
+    Бюджеты посчитаны для пустого кэша: все карточки рисуются заново.
+    Если тест упал, сначала ищите обращение к связанному объекту без
+    select_related, а не поднимайте бюджет.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username="reader")
+        cls.groups = [
+            Group.objects.create(
+                title="Группа %s" % number,
+                slug="group-%s" % number,
+                description="Описание",
+            )
+            for number in range(3)
+        ]
+        cls.authors = [
+            User.objects.create_user(username="author%s" % number)
+            for number in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for number in range(15):
+            Post.objects.create(
+                author=cls.authors[number % 3],
+                group=cls.groups[number % 3],
+                text="Пост %s" % number,
+            )
+        cls.post = Post.objects.first()
+        for number in range(5):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.authors[number % 3],
+                text="Комментарий %s" % number,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assertPageBudget(self, url, budget):
+        with self.assertQueryBudget(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_index(self):
+        """Главная: COUNT, сессия, пользователь, посты с авторами"""
+        self.assertPageBudget(reverse("posts:index"), 4)
+
+    def test_group_list(self):
+        """Группа: плюс поиск группы для версии кэша и сама группа"""
+        self.assertPageBudget(reverse("posts:list", args=["group-0"]), 6)
+
+    def test_profile(self):
+        """Профиль: плюс автор, подписка и счетчики"""
+        self.assertPageBudget(reverse("posts:profile", args=["author0"]), 8)
+
+    def test_follow_index(self):
+        """Лента подписок: записи ленты вместе с постами и авторами"""
+        self.assertPageBudget(reverse("posts:follow_index"), 5)
+
+    def test_post_detail(self):
+        """Пост: счетчик постов автора и комментарии с авторами"""
+        self.assertPageBudget(
+            reverse("posts:post_detail", args=[self.post.pk]), 5
+        )
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..paginators import encode_cursor
+from ..search import SearchResults, ensure_triggers, match_expression
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        Post.objects.bulk_create(
+            Post(author=cls.user, text="кот %s <b>жирный</b>" % number)
+            for number in range(13)
+        )
+        cls.best = Post.objects.create(author=cls.user, text="кот кот кот")
+        cls.other = Post.objects.create(author=cls.user, text="пес")
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_match_expression(self):
+        """Операторы FTS5 из запроса не попадают в MATCH"""
+        self.assertEqual(match_expression('кот" OR пес'), '"кот" "OR" "пес"*')
+        self.assertIsNone(match_expression("  ***  "))
+
+    def test_ranked_with_snippet(self):
+        """Самый релевантный пост первый, совпадение выделено"""
+        results = SearchResults("кот")
+        self.assertEqual(results.count(), 14)
+        first = results[0:1][0]
+        self.assertEqual(first, self.best)
+        self.assertIn("<mark>кот</mark>", first.snippet)
+        snippet = results[1:2][0].snippet
+        self.assertIn("&lt;b&gt;", snippet)
+
+    def test_index_follows_edits(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        self.other.text = "новый кот"
+        self.other.save()
+        self.assertEqual(SearchResults("новый").count(), 1)
+        self.assertEqual(SearchResults("пес").count(), 0)
+        self.other.delete()
+        self.assertEqual(SearchResults("новый").count(), 0)
+
+    def test_triggers_restored_after_table_rebuild(self):
+        """Потерянные при миграции триггеры восстанавливаются"""
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER posts_post_fts_insert")
+        Post.objects.create(author=self.user, text="потерянный")
+        ensure_triggers()
+        Post.objects.create(author=self.user, text="потерянный снова")
+        self.assertEqual(SearchResults("потерянный").count(), 2)
+
+    def test_cursor_pages(self):
+        """Курсорные страницы поиска не теряют и не повторяют постов"""
+        url = reverse("posts:search")
+        response = self.guest_client.get(url, {"q": "кот"})
+        seen = list(response.context["page_obj"])
+        self.assertEqual(len(seen), 10)
+        self.assertContains(response, "&amp;q=%D0%BA%D0%BE%D1%82")
+        response = self.guest_client.get(
+            url, {"q": "кот", "after": encode_cursor(seen[-1])}
+        )
+        rest = list(response.context["page_obj"])
+        self.assertEqual(len(rest), 4)
+        self.assertFalse(set(seen) & set(rest))
+        response = self.guest_client.get(
+            url, {"q": "кот", "before": encode_cursor(rest[0])}
+        )
+        self.assertEqual(list(response.context["page_obj"]), seen)
+
+    @mock.patch("posts.search.RANK_LIMIT", 5)
+    def test_broad_query_newest_first(self):
+        """Слишком широкий запрос сортируется от новых постов к старым"""
+        results = SearchResults("кот")
+        first = results[0:10]
+        self.assertEqual(first[0], self.best)
+        self.assertEqual([post.pk for post in first], sorted(
+            (post.pk for post in first), reverse=True
+        ))
+        rest = results.seek((first[-1].pub_date, first[-1].pk), True, 10)
+        self.assertEqual(len(rest), 4)
+        self.assertEqual(
+            results.seek((rest[0].pub_date, rest[0].pk), False, 10),
+            first[::-1],
+        )
+
+    def test_empty_query(self):
+        """Пустой запрос показывает пустую страницу"""
+        response = self.guest_client.get(reverse("posts:search"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["page_obj"]), 0)
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идет по индексу"""
+        admin = site._registry[Post]
+        request = RequestFactory().get("/")
+        queryset, distinct = admin.get_search_results(
+            request, Post.objects.all(), "пес"
+        )
+        self.assertEqual(list(queryset), [self.other])
+        self.assertFalse(distinct)
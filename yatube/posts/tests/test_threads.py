@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+from ..threads import reply_parent, subtree
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="talker")
+        cls.post = Post.objects.create(author=cls.user, text="Пост")
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(
+            post=self.post, author=self.user, text=text, parent=parent
+        )
+
+    def test_failed_path_rolls_back_comment(self):
+        """Если путь не записался, комментарий без пути не остается"""
+        with mock.patch(
+            "posts.threads.path_for", side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            self.comment("Без пути")
+        self.assertFalse(Comment.objects.exists())
+
+    def test_display_order(self):
+        """Ветки от новых к старым, ответы под родителем от старых"""
+        old = self.comment("старый")
+        new = self.comment("новый")
+        first = self.comment("ответ 1", old)
+        nested = self.comment("ответ на ответ", first)
+        second = self.comment("ответ 2", old)
+        ordered = Comment.objects.filter(post=self.post).order_by("path")
+        self.assertEqual(
+            list(ordered), [new, old, first, nested, second]
+        )
+        self.assertEqual([c.depth for c in ordered], [0, 0, 1, 2, 1])
+
+    def test_subtree_in_one_query(self):
+        """Ветка целиком читается одним запросом"""
+        root = self.comment("корень")
+        reply = self.comment("ответ", root)
+        deep = self.comment("глубже", reply)
+        self.comment("соседняя ветка")
+        with self.assertNumQueries(1):
+            self.assertEqual(list(subtree(root)), [root, reply, deep])
+        with self.assertNumQueries(1):
+            self.assertEqual(list(subtree(reply)), [reply, deep])
+
+    @override_settings(COMMENT_MAX_DEPTH=2)
+    def test_depth_limit(self):
+        """Ответ глубже предела встает рядом с родителем"""
+        root = self.comment("корень")
+        reply = self.comment("ответ", root)
+        deepest = self.comment("предел", reply)
+        self.assertEqual(reply_parent(self.post.pk, deepest.pk), reply)
+        self.assertEqual(reply_parent(self.post.pk, reply.pk), reply)
+
+    def test_reply_through_view(self):
+        """Ответ из формы попадает в ветку; чужой родитель игнорируется"""
+        root = self.comment("корень")
+        other = Post.objects.create(author=self.user, text="Другой")
+        foreign = Comment.objects.create(
+            post=other, author=self.user, text="чужой"
+        )
+        url = reverse("posts:add_comment", args=[self.post.pk])
+        self.client.post(url, {"text": "ответ", "parent": root.pk})
+        self.client.post(url, {"text": "мимо", "parent": foreign.pk})
+        self.assertEqual(Comment.objects.get(text="ответ").parent, root)
+        self.assertIsNone(Comment.objects.get(text="мимо").parent)
+
+    def test_reply_form_on_post_page(self):
+        """Ссылка «Ответить» подставляет родителя в форму"""
+        root = self.comment("корень")
+        url = reverse("posts:post_detail", args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertContains(response, "?reply_to=%s" % root.pk)
+        response = self.client.get(url, {"reply_to": root.pk})
+        self.assertContains(
+            response, 'name="parent" value="%s"' % root.pk
+        )
@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка, что блок укладывается в бюджет запросов к БД.
+
+    В отличие от assertNumQueries не требует точного числа: страница
+    может стать дешевле, но не дороже. При превышении в сообщении
+    перечислены все запросы, чтобы сразу было видно лишний.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        if len(queries) > budget:
+            self.fail(
+                "%d запросов при бюджете %d:\n%s"
+                % (
+                    len(queries),
+                    budget,
+                    "\n".join(
+                        "%d. %s" % (number, query["sql"])
+                        for number, query in enumerate(queries, 1)
+                    ),
+                )
+            )
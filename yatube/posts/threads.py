@@ -0,0 +1,103 @@
+"""Ветки комментариев в виде materialized path.
+
+Путь комментария - звенья id от корня ветки до него, каждое шириной
+PATH_SEGMENT цифр. Звено корня инвертировано, поэтому при сортировке
+по пути ветки идут от новых к старым, а ответы внутри ветки - от старых
+к новым, каждый сразу под своим родителем. Страница комментариев и
+ветка целиком читаются одним запросом по индексу (post, path) без
+рекурсии.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import PATH_SEGMENT, Comment
+
+# Самый большой id, который помещается в звено
+MAX_ID = 10 ** PATH_SEGMENT - 1
+
+
+def path_for(comment_id, parent_path=""):
+    """Путь комментария с данным id под родителем с parent_path."""
+    if parent_path:
+        return parent_path + "%0*d" % (PATH_SEGMENT, comment_id)
+    return "%0*d" % (PATH_SEGMENT, MAX_ID - comment_id)
+
+
+def assign_path(comment):
+    """Записать путь только что созданного комментария.
+
+    Вызывается из post_save, то есть в транзакции Comment.save() (см.
+    core.models.AtomicSaveMixin): при ошибке откатится и сам комментарий.
+    """
+    parent_path = comment.parent.path if comment.parent_id else ""
+    comment.path = path_for(comment.pk, parent_path)
+    Comment.objects.filter(pk=comment.pk).update(path=comment.path)
+
+
+def fill_paths(comments, batch_size=1000):
+    """Записать пути комментариям, созданным в обход save().
+
+    Путь ответа строится из пути родителя, поэтому проходы повторяются,
+    пока есть комментарии без пути, у родителя которых путь уже есть.
+    В пределах прохода строки идут по id, и цепочка ответов, созданных
+    по порядку, заполняется за один проход.
+    """
+    while True:
+        filled = last_id = 0
+        while True:
+            batch = list(
+                comments.filter(path="", pk__gt=last_id)
+                .filter(Q(parent=None) | Q(parent__path__gt=""))
+                .order_by("pk")
+                .values_list("pk", "parent__path")[:batch_size]
+            )
+            if not batch:
+                break
+            # bulk_update строит CASE из выражений ORM и упирается в
+            # Python; простой UPDATE по id через executemany быстрее
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(
+                    "UPDATE %s SET path = %%s WHERE id = %%s"
+                    % Comment._meta.db_table,
+                    [
+                        (path_for(pk, parent_path or ""), pk)
+                        for pk, parent_path in batch
+                    ],
+                )
+            filled += len(batch)
+            last_id = batch[-1][0]
+        if not filled:
+            return
+
+
+def subtree(comment):
+    """Комментарий и все ответы под ним в порядке показа.
+
+    Диапазон [path, path + ":") вместо startswith: ":" идет в ASCII
+    сразу после "9", а LIKE в SQLite не всегда использует индекс.
+    """
+    return Comment.objects.filter(
+        post=comment.post_id,
+        path__gte=comment.path,
+        path__lt=comment.path + ":",
+    ).order_by("path")
+
+
+def reply_parent(post_id, parent_id):
+    """Комментарий поста, под которым встанет ответ, или None.
+
+    Ответ на комментарий глубже COMMENT_MAX_DEPTH встает рядом с ним,
+    под его предком на предельной глубине: ветка не уходит вправо
+    бесконечно, а путь не перерастает поле.
+    """
+    try:
+        parent = Comment.objects.get(pk=int(parent_id), post=post_id)
+    except (TypeError, ValueError, Comment.DoesNotExist):
+        return None
+    max_depth = settings.COMMENT_MAX_DEPTH
+    if parent.depth < max_depth:
+        return parent
+    return Comment.objects.get(
+        post=post_id, path=parent.path[: PATH_SEGMENT * max_depth]
+    )
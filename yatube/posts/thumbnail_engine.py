@@ -0,0 +1,73 @@
+"""Движок sorl-thumbnail, который не декодирует фото целиком.
+
+Стандартный движок разворачивает снимок с телефона в 12 Мп полностью
+(около 36 МБ пикселей), чтобы потом уменьшить его до 200-400 px.
+Здесь JPEG декодируется сразу в уменьшенном масштабе (draft: 1/2,
+1/4 или 1/8 на уровне DCT), остальные форматы сначала сжимаются
+reduce() по блокам, и только последний шаг делает LANCZOS.
+"""
+import math
+
+from django.conf import settings
+from PIL import Image
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.engines import pil_engine
+
+# Как в Image.thumbnail: грубое уменьшение останавливается на размере
+# не меньше REDUCING_GAP x итоговый, чтобы LANCZOS было из чего
+# сгладить картинку
+REDUCING_GAP = 2.0
+
+
+class Engine(pil_engine.Engine):
+    def get_image(self, source):
+        image = super().get_image(source)
+        width, height = image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            # Заголовок прочитан, пиксели еще нет: отказываемся до
+            # того, как картинка займет память
+            raise Image.DecompressionBombError(
+                "%s: %dx%d больше IMAGE_MAX_PIXELS"
+                % (source.name, width, height)
+            )
+        return image
+
+    def get_image_info(self, image):
+        # В миниатюру переносится только цветовой профиль,
+        # EXIF и прочие метаданные остаются в оригинале
+        info = super().get_image_info(image)
+        if "icc_profile" in info:
+            return {"icc_profile": info["icc_profile"]}
+        return {}
+
+    def create(self, image, geometry, options):
+        if image.format == "JPEG" and not options.get("cropbox"):
+            self._draft(image, geometry, options)
+        return super().create(image, geometry, options)
+
+    def _draft(self, image, geometry, options):
+        width, height = image.size
+        flipped = options.get(
+            "orientation", sorl_settings.THUMBNAIL_ORIENTATION
+        ) and self._flip_dimensions(image)
+        if flipped:
+            width, height = height, width
+        factor = self._calculate_scaling_factor(
+            width, height, geometry, options
+        )
+        if factor >= 1:
+            return
+        size = (
+            math.ceil(width * factor * REDUCING_GAP),
+            math.ceil(height * factor * REDUCING_GAP),
+        )
+        if flipped:
+            size = size[::-1]
+        image.draft(image.mode, size)
+
+    def _scale(self, image, width, height):
+        return image.resize(
+            (width, height),
+            resample=Image.LANCZOS,
+            reducing_gap=REDUCING_GAP,
+        )
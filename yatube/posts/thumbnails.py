@@ -0,0 +1,159 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = threading.local()
+
+
+def geometry(name):
+    """Размер миниатюры по имени из POST_THUMBNAIL_SIZES."""
+    return settings.POST_THUMBNAIL_SIZES[name]
+
+
+def source(image):
+    """Картинка поста для sorl вместе с хранилищем поля Post.image.
+
+    От класса хранилища зависят ключи sorl и имена миниатюр: по голому
+    имени sorl взял бы хранилище по умолчанию и сделал бы вторую копию.
+    """
+    return ImageFile(image, image_storage)
+
+
+def accepts_webp(request):
+    """Браузер сам сообщает в Accept, что понимает WebP."""
+    return "image/webp" in request.META.get("HTTP_ACCEPT", "")
+
+
+def variant_options(webp):
+    """Опции get_thumbnail для варианта миниатюры."""
+    if webp:
+        return {"format": "WEBP", "quality": settings.THUMBNAIL_WEBP_QUALITY}
+    return {}
+
+
+def variants(sizes=None):
+    """Все пары (размер, опции), которые могут понадобиться страницам."""
+    if sizes is None:
+        sizes = settings.POST_THUMBNAIL_SIZES.values()
+    return [
+        (size, variant_options(webp))
+        for size in sizes
+        for webp in (False, True)
+    ]
+
+
+def thumbnail(image, size, webp):
+    """Миниатюра картинки поста или None, если ее не удалось сделать."""
+    try:
+        return get_thumbnail(source(image), size, **variant_options(webp))
+    except Exception:
+        logger.exception("Не удалось создать миниатюру %s", image)
+        return None
+
+
+def generate_one(image_name, size, options):
+    try:
+        get_thumbnail(source(image_name), size, **options)
+    except Exception:
+        # Не страшно: миниатюра создастся при первом показе
+        logger.exception("Не удалось создать миниатюру %s", image_name)
+    finally:
+        # Поток пула живет дольше запроса, соединения закрываем сами
+        connections.close_all()
+
+
+def generate(image_name):
+    """Создать все миниатюры картинки, которые показывают страницы."""
+    for size, options in variants():
+        get_thumbnail(source(image_name), size, **options)
+
+
+def thumbnail_file(image_name, size, **options):
+    """Файл миниатюры, который вернет get_thumbnail, без ее создания."""
+    backend = default.backend
+    image = source(image_name)
+    # Те же опции, что собирает ThumbnailBackend.get_thumbnail: от них
+    # зависит имя файла
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault("format", backend._get_format(image))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(image, size, options)
+    return ImageFile(name, default.storage)
+
+
+def stored(image_name):
+    """Имена миниатюр картинки, которые sorl записал в kvstore."""
+    kvstore = default.kvstore
+    keys = kvstore._get(source(image_name).key, identity="thumbnails")
+    for key in keys or []:
+        thumbnail = kvstore._get(key)
+        if thumbnail:
+            yield thumbnail.name
+
+
+def warm(image_name, sizes, force=False):
+    """Создать недостающие миниатюры картинки; вернуть, сколько создано.
+
+    Миниатюра считается готовой, если ее файл есть в хранилище. Запись
+    в kvstore без файла (например, после очистки media/cache)
+    удаляется, иначе sorl так и отдавал бы ссылку на пустое место.
+    """
+    made = 0
+    for size, options in variants(sizes):
+        thumbnail = thumbnail_file(image_name, size, **options)
+        if thumbnail.exists():
+            if not force:
+                continue
+            thumbnail.delete()
+        default.kvstore.delete(thumbnail)
+        get_thumbnail(source(image_name), size, **options)
+        made += 1
+    return made
+
+
+def generate_later(image):
+    """Создать все варианты миниатюр параллельно в пуле потоков.
+
+    Внутри запроса они достраиваются после того, как ответ отдан
+    клиенту: request_finished ждет их, прежде чем воркер возьмет
+    следующий запрос, и временные MEDIA_ROOT не удаляются из-под потока.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix="thumbnails",
+        )
+    futures = [
+        _executor.submit(generate_one, image.name, size, options)
+        for size, options in variants()
+    ]
+    if not hasattr(_pending, "futures"):
+        _pending.futures = []
+    _pending.futures.extend(futures)
+    return futures
+
+
+def wait_pending():
+    """Дождаться миниатюр, заказанных в этом потоке."""
+    futures = getattr(_pending, "futures", None)
+    if futures:
+        _pending.futures = []
+        wait(futures)
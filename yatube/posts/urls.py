@@ -1,14 +1,32 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = "posts"
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("profile/<str:username>/", views.profile, name="profile"),
+    path("rss/", feeds.posts_rss, name="rss"),
+    path("atom/", feeds.posts_atom, name="atom"),
+    path("group/<slug:slug>/rss/", feeds.group_rss, name="group_rss"),
+    path("group/<slug:slug>/atom/", feeds.group_atom, name="group_atom"),
+    path(
+        "profile/<str:username>/rss/", feeds.author_rss, name="author_rss"
+    ),
+    path(
+        "profile/<str:username>/atom/",
+        feeds.author_atom,
+        name="author_atom",
+    ),
     path("posts/<int:post_id>/", views.post_detail, name="post_detail"),
+    path(
+        "posts/<int:post_id>/comments/",
+        views.post_comments,
+        name="comments",
+    ),
     path("group/<slug:slug>/", views.group_list, name="list"),
+    path("search/", views.search, name="search"),
     path("create/", views.post_create, name="post_create"),
     path("posts/<int:post_id>/edit/", views.post_edit, name="edit"),
     path(
@@ -1,33 +1,80 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render, redirect
-from .models import Follow, Post, Group, User
-from django.core.paginator import Paginator
+from .models import Comment, Follow, Post, Group, User
+from .counters import stats_for
+from .feed import FollowFeed
 from .forms import PostForm, CommentForm
+from .paginators import CommentPaginator, get_page
+from .threads import reply_parent
+from .search import SearchResults
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_headers
+from .cache import conditional_page, versioned_cache_page
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
 
 
-@cache_page(20)
+def group_scopes(request, slug):
+    group_id = (
+        Group.objects.filter(slug=slug).values_list("pk", flat=True).first()
+    )
+    if group_id is None:
+        return None
+    return ["group:%s" % group_id]
+
+
+def profile_scopes(request, username):
+    author_id = (
+        User.objects.filter(username=username)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if author_id is None:
+        return None
+    return ["author:%s" % author_id]
+
+
+def detail_post(request, post_id):
+    """Пост страницы; читается один раз и для ETag, и для самой страницы."""
+    if not hasattr(request, "_detail_post"):
+        request._detail_post = (
+            Post.objects.select_related("author", "group")
+            .filter(pk=post_id)
+            .first()
+        )
+    return request._detail_post
+
+
+def post_detail_scopes(request, post_id):
+    post = detail_post(request, post_id)
+    if post is None:
+        return None
+    # Под постом выводятся счетчики автора и название группы
+    scopes = ["post:%s" % post_id, "author:%s" % post.author_id]
+    if post.group_id is not None:
+        scopes.append("group:%s" % post.group_id)
+    return scopes
+
+
+@versioned_cache_page(lambda request: ["all"])
 def index(request):
     tamplate = "posts/index.html"
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related("author", "group")
+    page_obj = get_page(request, post_list, POSTS_PER_PAGE)
     context = {
         "page_obj": page_obj,
     }
     return render(request, tamplate, context)
 
 
+@conditional_page(group_scopes)
+@versioned_cache_page(group_scopes)
 def group_list(request, slug):
     tamplate = "posts/group_list.html"
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.filter(group=group).select_related("author", "group")
+    page_obj = get_page(request, posts, POSTS_PER_PAGE)
     title = "Все записи группы"
     context = {
         "group": group,
@@ -38,16 +85,19 @@ def group_list(request, slug):
     return render(request, tamplate, context)
 
 
+@conditional_page(profile_scopes)
+@versioned_cache_page(profile_scopes)
 def profile(request, username):
     tamplate = "posts/profile.html"
     author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.filter(author=author).select_related(
+        "author", "group"
+    )
+    page_obj = get_page(request, posts, POSTS_PER_PAGE)
     following = author.following.exists()
     context = {
         "author": author,
+        "stats": stats_for(author.pk),
         "posts": posts,
         "page_obj": page_obj,
         "following": following,
@@ -55,15 +105,58 @@ def profile(request, username):
     return render(request, tamplate, context)
 
 
+@conditional_page(post_detail_scopes)
+@vary_on_headers("Accept")
 def post_detail(request, post_id):
     tamplate = "posts/post_detail.html"
-    posts = get_object_or_404(Post, id=post_id)
-    comments = posts.comments.select_related("author", "post").all()
+    posts = detail_post(request, post_id)
+    if posts is None:
+        raise Http404("Пост не найден")
+    # Сразу показывается только первая страница комментариев,
+    # остальные подгружает post_comments
+    comments = CommentPaginator(
+        posts.comments.select_related("author"), COMMENTS_PER_PAGE
+    ).first_page()
     form = CommentForm()
     context = {
         "posts": posts,
+        "author_stats": stats_for(posts.author_id),
         "form": form,
         "comments": comments,
+        "reply_to": request.GET.get("reply_to", ""),
+    }
+    return render(request, tamplate, context)
+
+
+def post_comments(request, post_id):
+    """HTML следующей пачки комментариев поста после курсора ?after=."""
+    tamplate = "posts/includes/comments.html"
+    # Сам пост не нужен, только убедиться, что он есть
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    paginator = CommentPaginator(
+        Comment.objects.filter(post=post_id).select_related("author"),
+        COMMENTS_PER_PAGE,
+    )
+    after = request.GET.get("after")
+    if after:
+        comments = paginator.cursor_page(after=after)
+    else:
+        comments = paginator.first_page()
+    context = {
+        "post_id": post_id,
+        "comments": comments,
+    }
+    return render(request, tamplate, context)
+
+
+def search(request):
+    tamplate = "posts/search.html"
+    query = request.GET.get("q", "").strip()
+    page_obj = get_page(request, SearchResults(query), POSTS_PER_PAGE)
+    context = {
+        "query": query,
+        "page_obj": page_obj,
     }
     return render(request, tamplate, context)
 
@@ -108,16 +201,15 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        comment.parent = reply_parent(post.pk, request.POST.get("parent"))
         comment.save()
     return redirect("posts:post_detail", post_id=post_id)
 
 
 @login_required
+@vary_on_headers("Accept")
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page(request, FollowFeed(request.user), POSTS_PER_PAGE)
     title = "Лента постов"
     context = {
         "page_obj": page_obj,
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.instrumentation.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -51,7 +52,7 @@ ROOT_URLCONF = "yatube.urls"
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.instrumentation.InstrumentedDjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -138,3 +139,92 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
+
+# Общий кэш для всех воркеров на одной машине. Включается переменной
+# окружения YATUBE_SHARED_CACHE; для нескольких машин здесь указывается
+# Memcached или Redis, остальной код от бэкенда не зависит
+if os.environ.get("YATUBE_SHARED_CACHE"):
+    CACHES["default"] = {
+        "BACKEND": "core.cache_backends.SQLiteCache",
+        "LOCATION": os.environ.get(
+            "YATUBE_SHARED_CACHE_PATH",
+            os.path.join(BASE_DIR, "cache.sqlite3"),
+        ),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+
+# Размеры миниатюр постов: лента, страница поста и списки группы и
+# профиля. Все они создаются сразу после загрузки картинки
+POST_THUMBNAIL_SIZES = {
+    "feed": "400",
+    "detail": "300",
+    "list": "200",
+}
+
+# Рядом с каждой миниатюрой лежит WebP-вариант для браузеров, которые
+# его принимают; при таком качестве он заметно легче JPEG
+THUMBNAIL_WEBP_QUALITY = 80
+
+# Миниатюры из JPEG декодируются сразу в уменьшенном масштабе
+THUMBNAIL_ENGINE = "posts.thumbnail_engine.Engine"
+
+# Загрузки пишутся на диск кусками, а не собираются в памяти
+FILE_UPLOAD_HANDLERS = [
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
+# Картинки постов при загрузке уменьшаются до такой большей стороны:
+# этого хватает и для страницы поста, и для любых миниатюр
+IMAGE_MAX_EDGE = 2048
+IMAGE_QUALITY = 88
+
+# Картинки больше стольких пикселей не декодируются: 12 Мп снимок
+# с телефона проходит, "бомба" в десятки тысяч пикселей по стороне нет
+IMAGE_MAX_PIXELS = 50_000_000
+
+# Сколько потоков параллельно готовят миниатюры после загрузки
+THUMBNAIL_WORKERS = 3
+
+# Глубина веток комментариев: ответ на комментарий этой глубины
+# встает рядом с ним, а не уходит на уровень ниже
+COMMENT_MAX_DEPTH = 5
+
+# Метрики каждого запроса (SQL, кэш, шаблоны) пишутся в лог
+# core.instrumentation: запросы дольше SLOW_REQUEST_MS всегда, остальные
+# при YATUBE_REQUEST_LOG=INFO. Заголовок Server-Timing видит любой
+# клиент, поэтому он включен только при DEBUG, а в остальных окружениях
+# явно через YATUBE_SERVER_TIMING=1
+SERVER_TIMING = DEBUG or bool(os.environ.get("YATUBE_SERVER_TIMING"))
+SLOW_REQUEST_MS = 500
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.instrumentation": {
+            "handlers": ["console"],
+            "level": os.environ.get("YATUBE_REQUEST_LOG", "WARNING"),
+            "propagate": False,
+        },
+    },
+}
+
+# Страницы лент сбрасываются по версиям при изменении постов, но
+# версии лежат в том же кэше. LocMemCache у каждого процесса свой:
+# bump() в одном воркере не видят остальные, и они отдают старые
+# страницы, ETag и RSS, пока запись не истечет. Поэтому долго страницы
+# живут только в общем кэше, а в локальном - минуту
+if os.environ.get("YATUBE_SHARED_CACHE"):
+    POSTS_PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+else:
+    POSTS_PAGE_CACHE_TIMEOUT = 60
+
+# Сколько последних постов автора попадает в ленту сразу после подписки
+FEED_BACKFILL_LIMIT = 100
+
+# Посты авторов, у которых подписчиков не меньше этого числа, не
+# раскладываются по лентам при публикации, а подтягиваются при чтении
+FEED_FANOUT_THRESHOLD = 1000